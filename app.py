@@ -3,8 +3,12 @@ Sistema de Gestão de Associação Esportiva
 Flask + SQLAlchemy + Bootstrap
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, make_response, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, make_response, jsonify, g, has_request_context, send_file, message_flashed
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as SessaoFlask
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from datetime import datetime, date, time
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -15,19 +19,30 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 import os
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from time import perf_counter
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from functools import wraps
+from contextlib import contextmanager
 from urllib.parse import quote
+from config import config, gunicorn_workers_threads, opcoes_engine
+from cache import criar_cache
 from flask import jsonify
-from sqlalchemy import text
-from sqlalchemy.exc import ProgrammingError
+from sqlalchemy import text, event, select, update, insert, bindparam
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import ProgrammingError, IntegrityError
+from sqlalchemy.orm import attributes, joinedload, contains_eager, make_transient_to_detached
+from sqlalchemy.types import TypeDecorator
 
 # ================= CONFIGURAÇÃO =================
 app = Flask(__name__, static_folder='static')
 
-app.config['SECRET_KEY'] = os.environ.get(
-    'SECRET_KEY',
-    'dev-secret-key-change-in-production'
-)
+configuracao = config[os.environ.get('APP_CONFIG', 'default')]
+app.config.from_object(configuracao)
+configuracao.init_app(app)
 
 # ================= ROTAS PWA =================
 @app.route("/manifest.json")
@@ -35,32 +50,107 @@ def manifest():
     return app.send_static_file("manifest.json")
 
 # ================= BANCO DE DADOS =================
-db_url = os.environ.get("DATABASE_URL")
-
-# 🔥 CORREÇÃO AQUI
-if db_url:
-    db_url = db_url.strip()
+# URL (com a correção do postgres:// do Render), réplica e opções do pool vêm de config.py
+db_url = app.config["SQLALCHEMY_DATABASE_URI"]
+db_read_url = app.config["DATABASE_READ_URL"]
 
 # Permite rodar local com SQLite
-if not db_url:
-    db_url = "sqlite:///local.db"
+if not os.environ.get("DATABASE_URL", "").strip():
     print("DATABASE_URL nao encontrada. Usando SQLite local.")
 
-# Corrige padrão antigo do Render
-if db_url.startswith("postgres://"):
-    db_url = db_url.replace("postgres://", "postgresql://", 1)
-
-app.config["SQLALCHEMY_DATABASE_URI"] = db_url
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
 # ================= LOG =================
 logging.basicConfig(
-    level=logging.INFO,
+    level=app.config['LOG_LEVEL'],
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
-db = SQLAlchemy(app)
+# Perfil do SQLite (banco local/fallback), aplicado a cada conexão nova:
+# - WAL: leitores não bloqueiam o escritor e vice-versa
+# - synchronous=NORMAL: seguro com WAL e bem mais rápido que FULL
+# - busy_timeout: espera o lock em vez de falhar com "database is locked"
+# - foreign_keys=ON: mesma integridade que o Postgres já garante
+# - cache_size negativo = tamanho em KiB
+SQLITE_PERFIL = os.environ.get('SQLITE_PERFIL', '1') == '1'
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 10000))
+SQLITE_CACHE_MB = int(os.environ.get('SQLITE_CACHE_MB', 32))
+
+@event.listens_for(Engine, 'connect')
+def _configurar_sqlite(dbapi_connection, connection_record):
+    if not SQLITE_PERFIL or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}')
+    finally:
+        cursor.close()
+
+# ================= RÉPLICA DE LEITURA =================
+# Com DATABASE_READ_URL definida, os SELECTs dos endpoints em ENDPOINTS_REPLICA
+# (apenas GET/HEAD) vão para a réplica; flush, INSERT/UPDATE/DELETE, SQL textual
+# e todas as outras rotas usam o primário. Depois de um POST o navegador do
+# usuário lê do primário por REPLICA_ATRASO_MAX segundos (inclusive a página do
+# redirect), para ver o que acabou de gravar mesmo com a réplica atrasada.
+
+ENDPOINTS_REPLICA = {
+    'index', 'ranking', 'jogos', 'jogadores', 'financeiro', 'associados', 'placares',
+    'auditoria', 'whatsapp_grupo', 'pdf_caixa', 'pdf_caixa_periodo', 'pdf_mensalidades', 'pdf_partida',
+}
+REPLICA_ATRASO_MAX = float(os.environ.get('REPLICA_ATRASO_MAX', 10))
+
+class SessaoRoteada(SessaoFlask):
+    """Sessão que envia as leituras da requisição para a réplica quando permitido"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and getattr(clause, 'is_select', False)
+                and has_request_context() and g.get('usar_replica')):
+            return self._db.engines['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+# A sessão já é por requisição (removida no fim do app context). Objetos não
+# expiram no commit: as rotas redirecionam após gravar, e recarregar tudo a cada
+# commit só gerava SELECTs repetidos.
+db = SQLAlchemy(app, session_options={'expire_on_commit': False, 'class_': SessaoRoteada})
+
+@app.before_request
+def _escolher_banco_de_leitura():
+    g.usar_replica = (
+        bool(db_read_url)
+        and request.method in ('GET', 'HEAD')
+        and request.endpoint in ENDPOINTS_REPLICA
+        and session.get('_ler_primario_ate', 0) < datetime.now().timestamp()
+    )
+
+@app.after_request
+def _ler_do_primario_apos_gravar(response):
+    if db_read_url and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+        session['_ler_primario_ate'] = datetime.now().timestamp() + REPLICA_ATRASO_MAX
+    return response
+
+@contextmanager
+def ler_do_primario():
+    """Bloco em que as leituras vão ao primário, ex.: ao preencher caches compartilhados"""
+    if not has_request_context():
+        yield
+        return
+    anterior = g.get('usar_replica', False)
+    g.usar_replica = False
+    try:
+        yield
+    finally:
+        g.usar_replica = anterior
+
+@app.teardown_request
+def _encerrar_transacao(exc):
+    """Fim da requisição: desfaz o que não foi confirmado (as rotas fazem commit explícito)"""
+    try:
+        db.session.rollback()
+    except Exception as e:
+        logger.error(f"Erro ao encerrar a transação da requisição: {e}")
 
 # ================= LOGIN =================
 login_manager = LoginManager()
@@ -69,6 +159,41 @@ login_manager.login_view = 'login'
 login_manager.login_message = None
 
 
+# ================= DINHEIRO =================
+# Valores monetários são gravados em centavos (inteiro) e lidos como Decimal
+# com duas casas: somas no banco e em Python são exatas, sem deriva de float.
+
+CENTAVO = Decimal('0.01')
+
+def dinheiro(valor):
+    """Converte int/float/str/Decimal em Decimal arredondado ao centavo"""
+    if valor is None:
+        return Decimal('0.00')
+    if isinstance(valor, float):
+        valor = repr(valor)  # evita carregar o erro binário do float (0.1 -> 0.1000000000000000055...)
+    return Decimal(valor).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+def para_centavos(valor):
+    return int(dinheiro(valor).scaleb(2))
+
+def de_centavos(centavos):
+    return Decimal(int(round(centavos))).scaleb(-2)
+
+class Dinheiro(TypeDecorator):
+    """Coluna monetária: BIGINT em centavos no banco, Decimal em Python"""
+    impl = db.BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, valor, dialect):
+        return None if valor is None else para_centavos(valor)
+
+    def process_result_value(self, valor, dialect):
+        return None if valor is None else de_centavos(valor)
+
+    def coerce_compared_value(self, op, valor):
+        # Literais em expressões (c.total_pago > 0, c.saldo + valor) também viram centavos
+        return self
+
 # ================= MODELOS =================
 
 class User(UserMixin, db.Model):
@@ -105,7 +230,8 @@ class User(UserMixin, db.Model):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Sem ida ao banco a cada requisição: ver usuario_em_cache (CACHE DA APLICAÇÃO)
+    return usuario_em_cache(int(user_id))
 
 class Jogador(db.Model):
     """Modelo para jogadores (sócios e convidados)"""
@@ -126,14 +252,30 @@ class Jogo(db.Model):
     horario = db.Column(db.Time, nullable=False, default=time(16, 0))  # 16:00 por padrão
     adversario = db.Column(db.String(100))
     local = db.Column(db.String(100))
-    valor_jogo = db.Column(db.Float, default=0)
+    valor_jogo = db.Column(Dinheiro, default=0)
     resumo_texto = db.Column(db.Text)
-    craque_id = db.Column(db.Integer, db.ForeignKey('jogador.id'))
+    craque_id = db.Column(db.Integer, db.ForeignKey('jogador.id'), index=True)
+    
+    # Placar (registrado em /placares)
+    gols_pro = db.Column(db.Integer)  # Gols da associação
+    gols_contra = db.Column(db.Integer)  # Gols do adversário
+    status = db.Column(db.String(15), index=True)  # realizado / cancelado / adiado (vazio = agendado)
     
     # Relacionamentos
     participantes = db.relationship('Participacao', backref='jogo', cascade="all, delete-orphan")
     craque = db.relationship('Jogador', foreign_keys=[craque_id])
     
+    @property
+    def tem_placar(self):
+        return self.gols_pro is not None and self.gols_contra is not None
+    
+    @property
+    def placar_texto(self):
+        """Placar no formato exibido nas telas, ex: '3 x 1 - realizado'"""
+        if not self.tem_placar:
+            return None
+        return f"{self.gols_pro} x {self.gols_contra} - {self.status or 'agendado'}"
+    
     def __repr__(self):
         return f'<Jogo {self.data} vs {self.adversario}>'
 
@@ -146,7 +288,7 @@ class Participacao(db.Model):
     # Presença e Financeiro
     confirmou = db.Column(db.Boolean, default=False)
     pagou = db.Column(db.Boolean, default=False)
-    valor_pago = db.Column(db.Float, default=0)
+    valor_pago = db.Column(Dinheiro, default=0)
     lancado_financeiro = db.Column(db.Boolean, default=False)  # Evita duplicar no financeiro
 
     # Estatísticas
@@ -155,8 +297,12 @@ class Participacao(db.Model):
 
     jogador = db.relationship('Jogador')
     
-    # Índice único para evitar duplicatas
-    __table_args__ = (db.UniqueConstraint('jogo_id', 'jogador_id', name='unique_participacao'),)
+    __table_args__ = (
+        # Índice único para evitar duplicatas
+        db.UniqueConstraint('jogo_id', 'jogador_id', name='unique_participacao'),
+        # Pagamentos por jogador (ranking financeiro / recálculo das estatísticas)
+        db.Index('ix_participacao_jogador_pagou', 'jogador_id', 'pagou'),
+    )
     
     def __repr__(self):
         return f'<Participacao {self.jogador.nome} no jogo {self.jogo_id}>'
@@ -167,14 +313,27 @@ class Financeiro(db.Model):
     data = db.Column(db.Date, nullable=False, index=True)
     tipo = db.Column(db.String(15), nullable=False, index=True)  # MENSALIDADE / PARTIDA / DESPESA
     descricao = db.Column(db.String(200))
-    valor = db.Column(db.Float, nullable=False)
+    valor = db.Column(Dinheiro, nullable=False)
     # Campos adicionais para mensalidades
     jogador_id = db.Column(db.Integer, db.ForeignKey('jogador.id'), nullable=True, index=True)
-    mes_referencia = db.Column(db.String(20))  # Ex: "01/2024" ou "Janeiro/2024"
+    # Partida a que a movimentação pertence (despesas e pagamentos lançados em presencas)
+    jogo_id = db.Column(db.Integer, db.ForeignKey('jogo.id'), nullable=True, index=True)
+    mes_referencia = db.Column(db.String(20))  # Texto exibido, ex: "Janeiro/2024"
     ano_referencia = db.Column(db.Integer)  # Ano da mensalidade
+    mes = db.Column(db.Integer)  # Mês da mensalidade (1-12)
     
     jogador = db.relationship('Jogador', foreign_keys=[jogador_id])
     
+    __table_args__ = (
+        # Uma mensalidade por sócio/ano/mês; também atende filtros e o PDF
+        db.Index('uq_financeiro_mensalidade', 'jogador_id', 'ano_referencia', 'mes', unique=True,
+                 postgresql_where=text("tipo = 'MENSALIDADE'"),
+                 sqlite_where=text("tipo = 'MENSALIDADE'")),
+        # Filtro por tipo + ordem/intervalo de data: extrato (cursor data, id), totais
+        # por período e todas_despesas (tipo='DESPESA' ORDER BY data) em presencas
+        db.Index('ix_financeiro_tipo_data', 'tipo', 'data', 'id'),
+    )
+    
     def __repr__(self):
         return f'<Financeiro {self.tipo} - R$ {self.valor}>'
 
@@ -192,8 +351,1508 @@ class Auditoria(db.Model):
     def __repr__(self):
         return f'<Auditoria {self.acao} - {self.data_hora}>'
 
+class EstatisticaJogador(db.Model):
+    """Totais acumulados por jogador, mantidos pelos eventos de flush (ver ESTATÍSTICAS)"""
+    __tablename__ = 'estatistica_jogador'
+
+    jogador_id = db.Column(db.Integer, db.ForeignKey('jogador.id', ondelete='CASCADE'), primary_key=True)
+    jogos = db.Column(db.Integer, nullable=False, default=0)
+    confirmados = db.Column(db.Integer, nullable=False, default=0)
+    pagos = db.Column(db.Integer, nullable=False, default=0)
+    total_pago = db.Column(Dinheiro, nullable=False, default=0, index=True)
+    gols = db.Column(db.Integer, nullable=False, default=0, index=True)
+    expulsoes = db.Column(db.Integer, nullable=False, default=0)
+    craques = db.Column(db.Integer, nullable=False, default=0)
+
+    jogador = db.relationship('Jogador')
+
+    def __repr__(self):
+        return f'<EstatisticaJogador {self.jogador_id}: {self.jogos} jogos, {self.gols} gols>'
+
+class SaldoDiario(db.Model):
+    """Fechamento do caixa por dia, mantido a cada lançamento/extorno (ver SALDO DO CAIXA)"""
+    __tablename__ = 'saldo_diario'
+
+    data = db.Column(db.Date, primary_key=True)
+    entradas = db.Column(Dinheiro, nullable=False, default=0)  # Tudo que não é DESPESA
+    despesas = db.Column(Dinheiro, nullable=False, default=0)
+    saldo = db.Column(Dinheiro, nullable=False, default=0)  # Saldo no fim do dia
+
+    def __repr__(self):
+        return f'<SaldoDiario {self.data} - R$ {self.saldo}>'
+
+class FechamentoAnual(db.Model):
+    """Resumo imutável de um ano fechado (ver FECHAMENTO ANUAL)"""
+    __tablename__ = 'fechamento_anual'
+
+    ano = db.Column(db.Integer, primary_key=True)
+    entradas = db.Column(Dinheiro, nullable=False, default=0)  # Tudo que não é DESPESA
+    despesas = db.Column(Dinheiro, nullable=False, default=0)
+    saldo_final = db.Column(Dinheiro, nullable=False, default=0)  # Saldo do caixa em 31/12
+    quantidade = db.Column(db.Integer, nullable=False, default=0)  # Movimentações no ano
+    fechado_em = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    fechado_por = db.Column(db.String(100))
+
+    tipos = db.relationship('FechamentoAnualTipo', order_by='FechamentoAnualTipo.tipo')
+
+    @property
+    def resultado(self):
+        return self.entradas - self.despesas
+
+    def __repr__(self):
+        return f'<FechamentoAnual {self.ano} - R$ {self.saldo_final}>'
+
+class FechamentoAnualTipo(db.Model):
+    """Total de um tipo de movimentação (MENSALIDADE, PARTIDA...) em um ano fechado"""
+    __tablename__ = 'fechamento_anual_tipo'
+
+    ano = db.Column(db.Integer, db.ForeignKey('fechamento_anual.ano'), primary_key=True)
+    tipo = db.Column(db.String(15), primary_key=True)
+    total = db.Column(Dinheiro, nullable=False, default=0)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<FechamentoAnualTipo {self.ano} {self.tipo} - R$ {self.total}>'
+
+class MensalidadeSocio(db.Model):
+    """Situação da mensalidade de cada sócio em cada mês (ver MATRIZ DE MENSALIDADES)"""
+    __tablename__ = 'mensalidade_socio'
+
+    jogador_id = db.Column(db.Integer, db.ForeignKey('jogador.id', ondelete='CASCADE'), primary_key=True)
+    ano = db.Column(db.Integer, primary_key=True)
+    mes = db.Column(db.Integer, primary_key=True)  # 1-12
+    valor = db.Column(Dinheiro, nullable=False, default=0)  # Valor devido na competência
+    vencimento = db.Column(db.Date, nullable=False)
+    pago = db.Column(db.Boolean, nullable=False, default=False)
+    valor_pago = db.Column(Dinheiro, nullable=False, default=0)
+    data_pagamento = db.Column(db.Date)
+    financeiro_id = db.Column(db.Integer)  # Mensalidade lançada em Financeiro
+
+    jogador = db.relationship('Jogador')
+
+    __table_args__ = (
+        # Lista de inadimplentes: pago = false AND vencimento < hoje
+        db.Index('ix_mensalidade_socio_atraso', 'pago', 'vencimento'),
+        # Grade do ano (sócio x mês)
+        db.Index('ix_mensalidade_socio_competencia', 'ano', 'mes'),
+    )
+
+    @property
+    def atrasada(self):
+        return not self.pago and self.vencimento < date.today()
+
+    def __repr__(self):
+        return f'<MensalidadeSocio {self.jogador_id} {self.mes:02d}/{self.ano} - {"paga" if self.pago else "em aberto"}>'
+
+class VersaoDados(db.Model):
+    """Contador de versão por tabela, incrementado na transação que a grava (ver VERSÕES DOS DADOS)"""
+    __tablename__ = 'versao_dados'
+
+    tabela = db.Column(db.String(30), primary_key=True)
+    versao = db.Column(db.BigInteger, nullable=False, default=0)
+    alterado_em = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<VersaoDados {self.tabela} v{self.versao}>'
+
+# ================= CARREGAMENTO DE RELACIONAMENTOS =================
+# Relacionamentos lidos linha a linha em templates e PDFs vêm no mesmo SELECT
+# da lista (JOIN), em vez de um SELECT extra por linha (N+1). Toda rota que
+# renderiza lista usa estas opções em .options(...).
+
+PARTICIPACAO_COM_JOGADOR = joinedload(Participacao.jogador)
+FINANCEIRO_COM_JOGADOR = joinedload(Financeiro.jogador)
+JOGO_COM_CRAQUE = joinedload(Jogo.craque)
+USUARIO_COM_JOGADOR = joinedload(User.jogador)
+
+# Detector (só em modo debug): conta os lazy loads de cada requisição e avisa
+# quando passam do limite; com LAZY_LOAD_ERRO=1 a requisição falha no ponto exato.
+LAZY_LOAD_LIMITE = int(os.environ.get('LAZY_LOAD_LIMITE', 10))
+LAZY_LOAD_ERRO = os.environ.get('LAZY_LOAD_ERRO', '0') == '1'
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _contar_lazy_load(orm_execute_state):
+    if not orm_execute_state.is_select or orm_execute_state.lazy_loaded_from is None:
+        return
+    if not app.debug or not has_request_context():
+        return
+    caminho = orm_execute_state.loader_strategy_path
+    relacionamento = str(caminho[-1]) if caminho else '?'
+    lazy_loads = g.setdefault('lazy_loads', {})
+    lazy_loads[relacionamento] = lazy_loads.get(relacionamento, 0) + 1
+    if LAZY_LOAD_ERRO and sum(lazy_loads.values()) > LAZY_LOAD_LIMITE:
+        raise RuntimeError(
+            f"Lazy loads acima do limite ({LAZY_LOAD_LIMITE}) em {request.endpoint}: {relacionamento}"
+        )
+
+@app.after_request
+def _avisar_lazy_loads(response):
+    lazy_loads = g.get('lazy_loads')
+    if lazy_loads and sum(lazy_loads.values()) > LAZY_LOAD_LIMITE:
+        detalhes = ', '.join(f"{nome} x{qtd}" for nome, qtd in sorted(lazy_loads.items(), key=lambda i: -i[1]))
+        logger.warning(
+            f"{request.method} {request.path}: {sum(lazy_loads.values())} lazy loads "
+            f"(limite {LAZY_LOAD_LIMITE}) - {detalhes}"
+        )
+    return response
+
+# ================= ESTATÍSTICAS DOS JOGADORES =================
+# A tabela estatistica_jogador é atualizada por deltas dentro da mesma transação
+# em que Participacao e Jogo.craque_id são gravados. Assim ranking e dashboard
+# leem um registro por jogador em vez de varrer todo o histórico.
+
+CAMPOS_PARTICIPACAO = ('jogador_id', 'confirmou', 'pagou', 'valor_pago', 'gols', 'expulso')
+CAMPOS_ESTATISTICA = ('jogos', 'confirmados', 'pagos', 'total_pago', 'gols', 'expulsoes', 'craques')
+
+def _contribuicao_participacao(valores):
+    """Converte os campos de uma participação na contribuição para as estatísticas"""
+    pagou = bool(valores.get('pagou'))
+    return {
+        'jogos': 1,
+        'confirmados': int(bool(valores.get('confirmou'))),
+        'pagos': int(pagou),
+        'total_pago': (valores.get('valor_pago') or 0) if pagou else 0,
+        'gols': valores.get('gols') or 0,
+        'expulsoes': int(bool(valores.get('expulso'))),
+    }
+
+def _acumular_delta(deltas, jogador_id, contribuicao, sinal):
+    if jogador_id is None:
+        return
+    acumulado = deltas.setdefault(jogador_id, dict.fromkeys(CAMPOS_ESTATISTICA, 0))
+    for campo, valor in contribuicao.items():
+        acumulado[campo] += sinal * valor
+
+def _insert_sem_conflito(tabela, conexao):
+    """INSERT que ignora chave duplicada (linha criada por outra transação concorrente)"""
+    if conexao.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialeto
+    elif conexao.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as insert_dialeto
+    else:
+        return insert(tabela)
+    return insert_dialeto(tabela).on_conflict_do_nothing()
+
+def _valor_novo(obj, campo, antigo):
+    """Valor após o flush: o que foi alterado na sessão ou o valor antigo do banco"""
+    historico = attributes.get_history(obj, campo, passive=attributes.PASSIVE_NO_INITIALIZE)
+    if historico.added:
+        return historico.added[0]
+    return antigo.get(campo)
+
+@event.listens_for(db.session, 'before_flush')
+def _capturar_estatisticas_antigas(session, flush_context, instances):
+    """Guarda o estado do banco das participações/jogos que serão alterados ou removidos"""
+    ids_participacao = [o.id for o in list(session.dirty) + list(session.deleted)
+                        if isinstance(o, Participacao) and o.id is not None]
+    ids_jogo = [o.id for o in list(session.dirty) + list(session.deleted)
+                if isinstance(o, Jogo) and o.id is not None]
+
+    antigos = {'participacao': {}, 'jogo': {}}
+    conexao = session.connection()
+    if ids_participacao:
+        tabela = Participacao.__table__
+        colunas = [tabela.c.id] + [tabela.c[c] for c in CAMPOS_PARTICIPACAO]
+        for linha in conexao.execute(select(*colunas).where(tabela.c.id.in_(ids_participacao))):
+            antigos['participacao'][linha.id] = dict(linha._mapping)
+    if ids_jogo:
+        tabela = Jogo.__table__
+        for linha in conexao.execute(select(tabela.c.id, tabela.c.craque_id).where(tabela.c.id.in_(ids_jogo))):
+            antigos['jogo'][linha.id] = linha.craque_id
+    session.info['estatisticas_antigas'] = antigos
+
+@event.listens_for(db.session, 'after_flush')
+def _atualizar_estatisticas(session, flush_context):
+    """Aplica os deltas de Participacao e Jogo.craque_id em estatistica_jogador"""
+    antigos = session.info.pop('estatisticas_antigas', {'participacao': {}, 'jogo': {}})
+    deltas = {}
+
+    for obj in session.new:
+        if isinstance(obj, Participacao):
+            valores = {c: getattr(obj, c) for c in CAMPOS_PARTICIPACAO}
+            _acumular_delta(deltas, valores['jogador_id'], _contribuicao_participacao(valores), 1)
+        elif isinstance(obj, Jogo) and obj.craque_id:
+            _acumular_delta(deltas, obj.craque_id, {'craques': 1}, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Participacao) and obj.id in antigos['participacao']:
+            antigo = antigos['participacao'][obj.id]
+            _acumular_delta(deltas, antigo['jogador_id'], _contribuicao_participacao(antigo), -1)
+        elif isinstance(obj, Jogo) and antigos['jogo'].get(obj.id):
+            _acumular_delta(deltas, antigos['jogo'][obj.id], {'craques': 1}, -1)
+
+    for obj in session.dirty:
+        if obj in session.deleted:
+            continue
+        if isinstance(obj, Participacao) and obj.id in antigos['participacao']:
+            antigo = antigos['participacao'][obj.id]
+            novo = {c: _valor_novo(obj, c, antigo) for c in CAMPOS_PARTICIPACAO}
+            _acumular_delta(deltas, antigo['jogador_id'], _contribuicao_participacao(antigo), -1)
+            _acumular_delta(deltas, novo['jogador_id'], _contribuicao_participacao(novo), 1)
+        elif isinstance(obj, Jogo) and obj.id in antigos['jogo']:
+            craque_antigo = antigos['jogo'][obj.id]
+            craque_novo = _valor_novo(obj, 'craque_id', {'craque_id': craque_antigo})
+            if craque_antigo != craque_novo:
+                _acumular_delta(deltas, craque_antigo, {'craques': 1}, -1)
+                _acumular_delta(deltas, craque_novo, {'craques': 1}, 1)
+
+    # Um INSERT e um UPDATE em lote (executemany) para todos os jogadores afetados
+    alterados = {jogador_id: delta for jogador_id, delta in deltas.items() if any(delta.values())}
+    if not alterados:
+        return
+    tabela = EstatisticaJogador.__table__
+    conexao = session.connection()
+    conexao.execute(_insert_sem_conflito(tabela, conexao), [
+        dict(jogador_id=jogador_id, **dict.fromkeys(CAMPOS_ESTATISTICA, 0)) for jogador_id in alterados
+    ])
+    conexao.execute(
+        update(tabela)
+        .where(tabela.c.jogador_id == bindparam('b_jogador_id'))
+        .values({campo: tabela.c[campo] + bindparam(f'delta_{campo}') for campo in CAMPOS_ESTATISTICA}),
+        [dict(b_jogador_id=jogador_id, **{f'delta_{campo}': valor for campo, valor in delta.items()})
+         for jogador_id, delta in alterados.items()]
+    )
+
+def recalcular_estatisticas_jogadores():
+    """Reconstrói estatistica_jogador a partir do histórico completo (backfill/conferência)"""
+    agregada = consulta_agregada_jogadores()
+    tabela = EstatisticaJogador.__table__
+    db.session.execute(tabela.delete())
+    db.session.execute(insert(tabela).from_select(
+        ['jogador_id'] + list(CAMPOS_ESTATISTICA),
+        select(agregada.c.jogador_id, *[agregada.c[c] for c in CAMPOS_ESTATISTICA])
+    ))
+    # Reconstrução via Core não passa pelos eventos do ORM: invalida o que lê estatistica_jogador
+    incrementar_versoes_dados(db.session.connection(), ('participacao', 'jogo'))
+    db.session.commit()
+    cache.invalidar('participacao', 'jogo')
+    total = db.session.query(db.func.count(EstatisticaJogador.jogador_id)).scalar()
+    logger.info(f"Estatísticas recalculadas para {total} jogadores")
+    return total
+
+# ================= CACHE DA APLICAÇÃO =================
+# Resultados de leitura caros (dashboard, rankings, lista de jogos) ficam em
+# cache.py, etiquetados pelas entidades de que dependem. Cada flush anota as
+# etiquetas das entidades gravadas e a mesma transação incrementa os contadores
+# de versao_dados (ver VERSÕES DOS DADOS). As entradas são validadas contra esses
+# contadores, a mesma fonte do ETag, então uma gravação em um worker vence o
+# cache de todos (exceto o usuário logado: ver USUARIO_CACHE_TTL). Com
+# CACHE_REDIS_URL os valores também são compartilhados; sem ela, cada processo
+# guarda os seus.
+
+cache = criar_cache(
+    app.config['CACHE_REDIS_URL'],
+    ttl=app.config['CACHE_TTL'],
+    max_itens=app.config['CACHE_MAX_ITENS'],
+    prefixo=app.config['CACHE_PREFIXO'],
+)
+
+ETIQUETAS_CACHE = {
+    Jogo: 'jogo',
+    Participacao: 'participacao',
+    Financeiro: 'financeiro',
+    Jogador: 'jogador',
+    User: 'usuario',
+}
+
+def em_cache(chave, etiquetas, calcular, ttl=None):
+    """Valor do cache ou calculado agora; o cálculo lê do primário, pois o cache é compartilhado"""
+    def calcular_no_primario():
+        with ler_do_primario():
+            return calcular()
+    return cache.obter(chave, calcular_no_primario, etiquetas, ttl)
+
+# Usuário logado: lido em toda requisição, então a etiqueta 'usuario' fica nos
+# contadores do backend (sem consultar versao_dados). Com Redis, um commit que
+# grava User vence a entrada em todos os workers; com o cache local, só no
+# processo que gravou, e os outros esperam no máximo este TTL
+USUARIO_CACHE_TTL = int(os.environ.get('USUARIO_CACHE_TTL', '60'))
+
+# Sem password_hash: o hash não sai do banco e carrega só quando a senha é conferida
+COLUNAS_USUARIO_CACHE = ('id', 'username', 'email', 'role', 'jogador_id', 'created_at', 'is_active')
+
+def usuario_em_cache(usuario_id):
+    """Usuário para o Flask-Login a partir do cache, ou None se não existir.
+
+    A instância volta anexada à sessão como persistente (merge sem SELECT):
+    relacionamentos e colunas fora do cache carregam sob demanda e alterações
+    são gravadas normalmente. Num acerto não há consulta nenhuma. Qualquer
+    commit que grave User invalida a entrada (promover_admin, remover_usuario,
+    reset de senha, cadastrar_senha_socio); ver USUARIO_CACHE_TTL.
+    """
+    def calcular():
+        linha = db.session.execute(
+            select(*[User.__table__.c[c] for c in COLUNAS_USUARIO_CACHE]).where(User.id == usuario_id)
+        ).first()
+        return dict(linha._mapping) if linha else None
+
+    colunas = em_cache(f'usuario:{usuario_id}', ('usuario',), calcular, ttl=USUARIO_CACHE_TTL)
+    if colunas is None:
+        return None
+    usuario = User(**colunas)
+    make_transient_to_detached(usuario)
+    return db.session.merge(usuario, load=False)
+
+@event.listens_for(db.session, 'after_flush')
+def _anotar_etiquetas_alteradas(session, flush_context):
+    alteradas = session.info.setdefault('etiquetas_alteradas', set())
+    for obj in list(session.new) + list(session.deleted):
+        if type(obj) in ETIQUETAS_CACHE:
+            alteradas.add(ETIQUETAS_CACHE[type(obj)])
+    for obj in session.dirty:
+        if type(obj) in ETIQUETAS_CACHE and session.is_modified(obj, include_collections=False):
+            alteradas.add(ETIQUETAS_CACHE[type(obj)])
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidar_cache_apos_commit(session):
+    alteradas = session.info.pop('etiquetas_alteradas', None)
+    if alteradas:
+        cache.invalidar(*alteradas)
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _descartar_etiquetas_alteradas(session, previous_transaction):
+    session.info.pop('etiquetas_alteradas', None)
+
+# ================= VERSÕES DOS DADOS =================
+# Cada tabela etiquetada tem um contador em versao_dados, incrementado uma vez
+# por transação que a grava (no flush, na mesma transação dos dados: vale para
+# todos os workers). As rotas de leitura montam um ETag com os contadores de que
+# dependem, o usuário e o dia; se o navegador já tem essa versão, a resposta é
+# 304 sem carregar objetos nem renderizar o template.
+
+def _versao_codigo():
+    # Um deploy com templates novos muda o ETag de todas as páginas
+    arquivos = [__file__] + [os.path.join(raiz, nome)
+                             for raiz, _, nomes in os.walk(os.path.join(app.root_path, 'templates'))
+                             for nome in nomes]
+    return str(int(max(os.path.getmtime(arquivo) for arquivo in arquivos)))
+
+VERSAO_CODIGO = _versao_codigo()
+
+def garantir_versoes_dados():
+    """Cria as linhas de versao_dados que faltarem (uma por tabela etiquetada)"""
+    conexao = db.session.connection()
+    conexao.execute(_insert_sem_conflito(VersaoDados.__table__, conexao), [
+        {'tabela': tabela, 'versao': 0} for tabela in ETIQUETAS_CACHE.values()
+    ])
+    db.session.commit()
+
+def incrementar_versoes_dados(conexao, tabelas):
+    """Incrementa na transação atual o contador das tabelas gravadas"""
+    tabela = VersaoDados.__table__
+    conexao.execute(
+        update(tabela)
+        .where(tabela.c.tabela.in_(sorted(tabelas)))
+        .values(versao=tabela.c.versao + 1, alterado_em=datetime.utcnow())
+    )
+
+def versoes_dados(tabelas, primario=True):
+    """{tabela: 'versão@data da alteração'}; primario=False lê do mesmo banco que a página.
+
+    A data entra junto porque um banco recriado recomeça os contadores do zero.
+    """
+    tabela = VersaoDados.__table__
+    consulta = select(tabela.c.tabela, tabela.c.versao, tabela.c.alterado_em).where(tabela.c.tabela.in_(tabelas))
+    if primario:
+        with ler_do_primario():
+            linhas = db.session.execute(consulta).all()
+    else:
+        linhas = db.session.execute(consulta).all()
+    return {nome: f'{versao}@{alterado_em}' for nome, versao, alterado_em in linhas}
+
+@event.listens_for(db.session, 'after_flush')
+def _incrementar_versoes_no_flush(session, flush_context):
+    # Roda depois de _anotar_etiquetas_alteradas; uma vez por tabela e transação
+    ja_incrementadas = session.info.setdefault('versoes_incrementadas', set())
+    novas = session.info.get('etiquetas_alteradas', set()) - ja_incrementadas
+    if novas:
+        incrementar_versoes_dados(session.connection(), novas)
+        ja_incrementadas.update(novas)
+
+@event.listens_for(db.session, 'after_commit')
+@event.listens_for(db.session, 'after_soft_rollback')
+def _encerrar_versoes_da_transacao(session, *args):
+    session.info.pop('versoes_incrementadas', None)
+    if has_request_context():
+        g.pop('versoes_dados', None)
+
+def versoes_da_requisicao():
+    """Todos os contadores, lidos do primário uma vez por requisição (até o próximo commit)"""
+    if not has_request_context():
+        return versoes_dados(tuple(ETIQUETAS_CACHE.values()))
+    if 'versoes_dados' not in g:
+        g.versoes_dados = versoes_dados(tuple(ETIQUETAS_CACHE.values()))
+    return g.versoes_dados
+
+def _versoes_para_cache(etiquetas):
+    # Versões das entradas do cache da aplicação: None (não usa o cache) se faltar contador
+    versoes = versoes_da_requisicao()
+    if any(etiqueta not in versoes for etiqueta in etiquetas):
+        return None
+    return tuple(versoes[etiqueta] for etiqueta in etiquetas)
+
+cache.fonte_versoes = _versoes_para_cache
+cache.etiquetas_do_backend = frozenset({'usuario'})
+
+def etag_dados(tabelas):
+    """ETag da página atual para o usuário logado, ou None se faltar algum contador"""
+    # Lido antes da página e do mesmo banco (primário ou réplica): a página nunca
+    # fica mais antiga que as versões do ETag. No primário, reaproveita a leitura
+    # da requisição (a mesma do cache)
+    if g.get('usar_replica'):
+        versoes = versoes_dados(tabelas, primario=False)
+    else:
+        versoes = {tabela: versao for tabela, versao in versoes_da_requisicao().items() if tabela in tabelas}
+    if len(versoes) < len(tabelas):
+        return None
+    if current_user.is_authenticated:
+        usuario = f'{current_user.id}:{current_user.role}:{current_user.username}'
+    else:
+        usuario = 'anonimo'
+    partes = [VERSAO_CODIGO, request.full_path, usuario, date.today().isoformat()]
+    partes += [f'{tabela}={versoes[tabela]}' for tabela in sorted(tabelas)]
+    return hashlib.sha1('|'.join(partes).encode()).hexdigest()[:20]
+
+def resposta_condicional(*tabelas):
+    """Decorator de rota GET: ETag pelas versões das tabelas e 304 se o cliente já tem a página.
+
+    Deve vir depois de @login_required (o ETag inclui o usuário). Com mensagens
+    flash pendentes a página é sempre renderizada, para não engolir a mensagem;
+    se a própria view der flash (ex.: ramo de erro que renderiza a página vazia)
+    ou marcar g.sem_etag, a resposta sai sem ETag e não vira 304 depois.
+    """
+    def decorador(view):
+        @wraps(view)
+        def envolvida(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(*args, **kwargs)
+            try:
+                etag = etag_dados(tabelas)
+            except Exception as e:
+                logger.warning(f"Sem ETag para {request.path}: {e}")
+                etag = None
+            if etag is None:
+                return view(*args, **kwargs)
+
+            if request.if_none_match.contains_weak(etag):
+                resposta = app.response_class(status=304)
+            else:
+                resposta = make_response(view(*args, **kwargs))
+                if resposta.status_code != 200 or g.get('sem_etag'):
+                    return resposta
+            resposta.set_etag(etag, weak=True)
+            # private: a página é do usuário; no-cache: sempre revalida (barato, via 304)
+            resposta.headers['Cache-Control'] = 'private, no-cache'
+            return resposta
+        return envolvida
+    return decorador
+
+@message_flashed.connect_via(app)
+def _flash_sem_etag(sender, message, category, **extra):
+    # Página com mensagem é da requisição, não do estado das tabelas
+    g.sem_etag = True
+
+# ================= CACHE DE FRAGMENTOS =================
+# {% cache chave, etiquetas[, ttl] %}...{% endcache %} guarda o HTML do trecho
+# no cache da aplicação, invalidado pelas mesmas etiquetas de entidade. O HTML
+# é o mesmo para todos que veem a página: controles por papel ficam fora do
+# bloco ou, quando estão dentro de cada linha, o papel entra na chave.
+
+class FragmentoEmCache(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.Const(parser.name or ''), parser.parse_expression()]
+        parser.stream.expect('comma')
+        args.append(parser.parse_expression())
+        args.append(parser.parse_expression() if parser.stream.skip_if('comma') else nodes.Const(None))
+        corpo = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_renderizar', args), [], [], corpo).set_lineno(lineno)
+
+    def _renderizar(self, template, chave, etiquetas, ttl, caller):
+        # Página lida da réplica pode estar atrasada, e chave None indica dados
+        # que não devem ficar (ex.: página de erro): renderiza sem guardar
+        if chave is None or (has_request_context() and g.get('usar_replica')):
+            return caller()
+        chave = f'fragmento:{VERSAO_CODIGO}:{template}:{chave}'
+        return Markup(cache.obter(chave, lambda: str(caller()), etiquetas, ttl))
+
+app.jinja_env.add_extension(FragmentoEmCache)
+
+# ================= CACHE DE PDFs =================
+# O PDF gerado é guardado em disco com nome = hash da rota, dos parâmetros que ela lê, das
+# versões das tabelas de que depende e do dia. Enquanto nada disso muda, o
+# download sai do arquivo via send_file (ETag e Range inclusos), sem ReportLab.
+# O arquivo .nome ao lado guarda o nome de download. A limpeza, a cada PDF novo,
+# apaga o que passou de PDF_CACHE_MAX_DIAS sem uso e, se a pasta passar de
+# PDF_CACHE_MAX_MB, os menos usados primeiro.
+
+PDF_CACHE_DIR = app.config['PDF_CACHE_DIR'] or os.path.join(app.instance_path, 'pdf_cache')
+PDF_CACHE_MAX_BYTES = app.config['PDF_CACHE_MAX_MB'] * 1024 * 1024
+PDF_CACHE_MAX_SEGUNDOS = app.config['PDF_CACHE_MAX_DIAS'] * 86400
+
+def _data_iso_valida(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').strftime('%Y-%m-%d') == valor
+    except ValueError:
+        return False
+
+# Parâmetros que cada PDF lê, com o que é aceito na chave. Outros parâmetros da
+# URL não entram (a rota os ignora); valor fora do aceito gera o PDF sem guardar.
+PARAMETROS_PDF = {
+    'pdf_mensalidades': {'ano': lambda v: v == '' or (v.isdigit() and len(v) == 4)},
+    'pdf_caixa_periodo': {
+        'data_inicio': lambda v: v == '' or _data_iso_valida(v),
+        'data_fim': lambda v: v == '' or _data_iso_valida(v),
+        'tipo': lambda v: v in ('', 'entradas', 'despesas'),
+    },
+}
+
+def _chave_pdf(tabelas, view_args):
+    parametros = {}
+    for nome, aceito in PARAMETROS_PDF.get(request.endpoint, {}).items():
+        valor = request.args.get(nome, '')
+        if not aceito(valor):
+            return None
+        parametros[nome] = valor
+    versoes = versoes_dados(tabelas)
+    if len(versoes) < len(tabelas):
+        return None
+    partes = [VERSAO_CODIGO, request.endpoint, date.today().isoformat()]
+    partes += [f'{nome}={valor}' for nome, valor in sorted(view_args.items())]
+    partes += [f'{nome}={valor}' for nome, valor in sorted(parametros.items())]
+    partes += [f'{tabela}={versoes[tabela]}' for tabela in sorted(tabelas)]
+    return hashlib.sha256('|'.join(partes).encode()).hexdigest()[:32]
+
+def _gravar_atomico(caminho, dados):
+    # Outro worker pode gravar o mesmo PDF ao mesmo tempo: escreve em temporário e troca
+    descritor, temporario = tempfile.mkstemp(dir=PDF_CACHE_DIR, suffix='.tmp')
+    with os.fdopen(descritor, 'wb') as arquivo:
+        arquivo.write(dados)
+    os.replace(temporario, caminho)
+
+def limpar_cache_pdf(agora=None):
+    """Remove PDFs sem uso há mais de PDF_CACHE_MAX_DIAS e, se preciso, os menos usados até caber no limite"""
+    agora = agora or datetime.now().timestamp()
+    entradas = []
+    for nome in os.listdir(PDF_CACHE_DIR):
+        if not nome.endswith('.pdf'):
+            continue
+        caminho = os.path.join(PDF_CACHE_DIR, nome)
+        try:
+            info = os.stat(caminho)
+        except FileNotFoundError:
+            continue
+        entradas.append((info.st_mtime, info.st_size, caminho))
+
+    entradas.sort()
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    removidos = 0
+    for usado_em, tamanho, caminho in entradas:
+        if agora - usado_em <= PDF_CACHE_MAX_SEGUNDOS and total <= PDF_CACHE_MAX_BYTES:
+            break
+        for arquivo in (caminho, caminho[:-len('.pdf')] + '.nome'):
+            try:
+                os.remove(arquivo)
+            except FileNotFoundError:
+                pass
+        total -= tamanho
+        removidos += 1
+    if removidos:
+        logger.info(f"Cache de PDFs: {removidos} arquivo(s) removido(s), {total / 1024:.0f} KB em uso")
+    return removidos
+
+def _enviar_pdf(caminho, chave, nome_download):
+    resposta = send_file(caminho, mimetype='application/pdf', as_attachment=True,
+                         download_name=nome_download, etag=chave, conditional=True, max_age=0)
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+def pdf_em_cache(*tabelas):
+    """Decorator de rota de PDF: serve do disco enquanto as tabelas não mudarem"""
+    def decorador(view):
+        @wraps(view)
+        def envolvida(*args, **kwargs):
+            if not PDF_CACHE_MAX_BYTES:
+                return view(*args, **kwargs)
+            try:
+                chave = _chave_pdf(tabelas, kwargs)
+            except Exception as e:
+                logger.warning(f"Cache de PDFs indisponível para {request.path}: {e}")
+                chave = None
+            if chave is None:
+                return view(*args, **kwargs)
+
+            caminho = os.path.join(PDF_CACHE_DIR, f'{chave}.pdf')
+            caminho_nome = os.path.join(PDF_CACHE_DIR, f'{chave}.nome')
+            try:
+                with open(caminho_nome, encoding='utf-8') as arquivo:
+                    nome_download = arquivo.read()
+                os.utime(caminho)  # marca o uso para a limpeza
+                return _enviar_pdf(caminho, chave, nome_download)
+            except FileNotFoundError:
+                pass
+
+            # O arquivo vale para todos: gera lendo do primário, como os demais caches
+            with ler_do_primario():
+                resposta = make_response(view(*args, **kwargs))
+            if resposta.status_code != 200 or resposta.mimetype != 'application/pdf':
+                return resposta
+            nome_download = resposta.headers.get('Content-Disposition', '').partition('filename=')[2] or f'{request.endpoint}.pdf'
+            try:
+                os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+                _gravar_atomico(caminho, resposta.get_data())
+                _gravar_atomico(caminho_nome, nome_download.encode('utf-8'))
+                limpar_cache_pdf()
+            except OSError as e:
+                logger.warning(f"Não foi possível guardar o PDF em cache: {e}")
+                return resposta
+            return _enviar_pdf(caminho, chave, nome_download)
+        return envolvida
+    return decorador
+
+# ================= RANKING =================
+# Os três rankings são ordenados no banco (ORDER BY ... LIMIT) sobre uma fonte
+# com as colunas de estatistica_jogador: a própria tabela mantida (padrão) ou a
+# agregação direta do histórico, que também serve para reconstruir a tabela.
+
+def consulta_agregada_jogadores():
+    """Totais por jogador em um único GROUP BY sobre Participacao ⋈ Jogo"""
+    participacoes = select(
+        Participacao.jogador_id.label('jogador_id'),
+        db.literal(1).label('jogos'),
+        db.case((Participacao.confirmou.is_(True), 1), else_=0).label('confirmados'),
+        db.case((Participacao.pagou.is_(True), 1), else_=0).label('pagos'),
+        db.case((Participacao.pagou.is_(True), db.func.coalesce(Participacao.valor_pago, 0)), else_=0).label('total_pago'),
+        db.func.coalesce(Participacao.gols, 0).label('gols'),
+        db.case((Participacao.expulso.is_(True), 1), else_=0).label('expulsoes'),
+        db.literal(0).label('craques'),
+    ).join(Jogo, Jogo.id == Participacao.jogo_id)
+
+    craques = select(
+        Jogo.craque_id, db.literal(0), db.literal(0), db.literal(0),
+        db.literal(0), db.literal(0), db.literal(0), db.literal(1),
+    ).where(Jogo.craque_id.isnot(None))
+
+    uniao = db.union_all(participacoes, craques).subquery()
+    return select(
+        uniao.c.jogador_id,
+        *[db.func.sum(uniao.c[c]).label(c) for c in CAMPOS_ESTATISTICA]
+    ).group_by(uniao.c.jogador_id).subquery('estatistica_agregada')
+
+def _colunas_jogador():
+    return (Jogador.id.label('jogador_id'), Jogador.nome, Jogador.tipo, Jogador.nativo)
+
+def _consultar_ranking(fonte, colunas, criterio, ordem, limite):
+    fonte = EstatisticaJogador.__table__ if fonte is None else fonte
+    consulta = select(*_colunas_jogador(), *colunas(fonte.c)).join(
+        fonte, fonte.c.jogador_id == Jogador.id
+    ).where(criterio(fonte.c)).order_by(*ordem(fonte.c), Jogador.nome).limit(limite)
+    return db.session.execute(consulta).all()
+
+def ranking_presenca(limite=None, fonte=None):
+    """Confirmou presença (+1) e pagou (+1), apenas quem participou de algum jogo"""
+    return _consultar_ranking(
+        fonte,
+        lambda c: (
+            c.jogos.label('total_jogos'),
+            c.confirmados.label('jogos_confirmados'),
+            c.pagos.label('jogos_pagos'),
+            (c.confirmados + c.pagos).label('pontuacao'),
+            db.cast(c.confirmados * 100.0 / c.jogos, db.Float).label('perc_presenca'),
+        ),
+        lambda c: c.jogos > 0,
+        lambda c: ((c.confirmados + c.pagos).desc(),),
+        limite,
+    )
+
+def ranking_financeiro(limite=None, fonte=None):
+    """Total pago em partidas e quantidade de pagamentos"""
+    return _consultar_ranking(
+        fonte,
+        lambda c: (
+            c.total_pago.label('total_pago'),
+            c.pagos.label('qtd_pagamentos'),
+            db.type_coerce(
+                db.func.round(db.cast(c.total_pago, db.Float) / db.func.nullif(c.pagos, 0)), Dinheiro
+            ).label('media_por_jogo'),
+        ),
+        lambda c: c.total_pago > 0,
+        lambda c: (c.total_pago.desc(),),
+        limite,
+    )
+
+def ranking_tecnico(limite=None, fonte=None):
+    """Gols (+1), craque do jogo (+1) e expulsões (-1)"""
+    return _consultar_ranking(
+        fonte,
+        lambda c: (
+            c.gols.label('total_gols'),
+            c.craques.label('craque_count'),
+            c.expulsoes.label('total_expulsoes'),
+            (c.gols + c.craques - c.expulsoes).label('pontuacao_tecnica'),
+        ),
+        lambda c: db.or_(c.gols > 0, c.craques > 0, c.expulsoes > 0),
+        lambda c: ((c.gols + c.craques - c.expulsoes).desc(),),
+        limite,
+    )
+
+def calcular_rankings(limite=None, fonte=None):
+    """Os três rankings da página /ranking como linhas compactas (Row)"""
+    return {
+        'ranking_presenca': ranking_presenca(limite, fonte),
+        'ranking_financeiro': ranking_financeiro(limite, fonte),
+        'ranking_tecnico': ranking_tecnico(limite, fonte),
+    }
+
+def rankings_em_cache(limite=None):
+    """calcular_rankings() com cache; as linhas viram dicts para poderem ser serializadas"""
+    def calcular():
+        return {nome: [dict(linha._mapping) for linha in linhas]
+                for nome, linhas in calcular_rankings(limite).items()}
+    return em_cache(f'ranking:{limite}', ('participacao', 'jogo', 'jogador'), calcular)
+
+# ================= DASHBOARD =================
+# Totais do caixa por tipo e artilharia em duas consultas, guardados no cache da
+# aplicação até o próximo commit que grave Financeiro, Participacao ou Jogador.
+
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', '300'))
+
+def _calcular_resumo_dashboard():
+    # Anos fechados vêm do resumo por tipo; só o período em aberto é agrupado em Financeiro
+    totais = {tipo: total or 0 for tipo, total in db.session.query(
+        FechamentoAnualTipo.tipo, db.func.sum(FechamentoAnualTipo.total)
+    ).group_by(FechamentoAnualTipo.tipo).all()}
+    em_aberto = db.session.query(Financeiro.tipo, db.func.sum(Financeiro.valor))
+    ultimo_fechado = ultimo_ano_fechado()
+    if ultimo_fechado is not None:
+        em_aberto = em_aberto.filter(Financeiro.data >= date(ultimo_fechado + 1, 1, 1))
+    for tipo, total in em_aberto.group_by(Financeiro.tipo).all():
+        totais[tipo] = totais.get(tipo, 0) + (total or 0)
+
+    artilharia = [
+        {'nome': nome, 'gols': gols}
+        for nome, gols in db.session.query(Jogador.nome, EstatisticaJogador.gols)
+        .join(EstatisticaJogador, EstatisticaJogador.jogador_id == Jogador.id)
+        .filter(EstatisticaJogador.gols > 0)
+        .order_by(EstatisticaJogador.gols.desc(), Jogador.nome)
+        .limit(10)
+        .all()
+    ]
+
+    despesas = totais.get('DESPESA', 0)
+    entradas = sum(total for tipo, total in totais.items() if tipo != 'DESPESA')
+    return {
+        'mensal': totais.get('MENSALIDADE', 0),
+        'partidas': totais.get('PARTIDA', 0),
+        'entradas': totais.get('ENTRADA', 0),
+        'despesas': despesas,
+        'saldo': entradas - despesas,
+        'artilharia': artilharia,
+    }
+
+def resumo_dashboard():
+    """Resumo financeiro e top 10 artilheiros do dashboard (com cache)"""
+    return em_cache('dashboard:resumo', ('financeiro', 'participacao', 'jogador'),
+                    _calcular_resumo_dashboard, ttl=DASHBOARD_CACHE_TTL)
+
+COLUNAS_LISTA_JOGOS = ('id', 'data', 'horario', 'adversario', 'local', 'gols_pro', 'gols_contra', 'status')
+
+def _jogos_transitorios(linhas):
+    # Instâncias fora da sessão: servem para exibir colunas e propriedades
+    # (tem_placar, placar_texto), não para gravar nem navegar relacionamentos
+    return [Jogo(**colunas) for colunas in linhas]
+
+def lista_jogos():
+    """Todos os jogos, mais recentes primeiro, para listas e seletores (com cache)"""
+    def calcular():
+        consulta = select(*[Jogo.__table__.c[c] for c in COLUNAS_LISTA_JOGOS]).order_by(Jogo.data.desc())
+        return [dict(linha._mapping) for linha in db.session.execute(consulta)]
+    return _jogos_transitorios(em_cache('jogos:lista', ('jogo',), calcular))
+
+def proximo_jogo_em_cache(hoje=None):
+    """Próximo jogo a partir de hoje (com cache por dia), ou None"""
+    hoje = hoje or date.today()
+    def calcular():
+        linha = db.session.execute(
+            select(*[Jogo.__table__.c[c] for c in COLUNAS_LISTA_JOGOS])
+            .where(Jogo.data >= hoje).order_by(Jogo.data.asc()).limit(1)
+        ).first()
+        return [dict(linha._mapping)] if linha else []
+    jogos = _jogos_transitorios(em_cache(f'jogos:proximo:{hoje.isoformat()}', ('jogo',), calcular))
+    return jogos[0] if jogos else None
+
+# ================= SALDO DO CAIXA =================
+# saldo_diario guarda, por dia, o total de entradas, de despesas e o saldo no
+# fim do dia. Cada lançamento ou extorno em Financeiro vira incrementos nessa
+# tabela (na mesma transação), então o extrato lê só o intervalo pedido: o saldo
+# antes de uma movimentação é o fechamento do dia menos o movimento do dia.
+
+def _acumular_movimento(por_dia, data, tipo, valor, sinal):
+    """Soma (sinal=1) ou desfaz (sinal=-1) uma movimentação no delta do dia"""
+    entradas, despesas = por_dia.get(data, (0, 0))
+    if tipo == 'DESPESA':
+        despesas += sinal * (valor or 0)
+    else:
+        entradas += sinal * (valor or 0)
+    por_dia[data] = (entradas, despesas)
+
+def _lancar_saldo_diario(conexao, data, entradas, despesas):
+    """Aplica em saldo_diario o delta de entradas/despesas de um dia"""
+    tabela = SaldoDiario.__table__
+    existe = conexao.execute(select(tabela.c.data).where(tabela.c.data == data)).first()
+    if not existe:
+        anterior = conexao.execute(
+            select(tabela.c.saldo).where(tabela.c.data < data).order_by(tabela.c.data.desc()).limit(1)
+        ).scalar() or 0
+        conexao.execute(_insert_sem_conflito(tabela, conexao).values(
+            data=data, entradas=0, despesas=0, saldo=anterior
+        ))
+
+    conexao.execute(update(tabela).where(tabela.c.data == data).values(
+        entradas=tabela.c.entradas + entradas, despesas=tabela.c.despesas + despesas
+    ))
+    conexao.execute(update(tabela).where(tabela.c.data >= data).values(
+        saldo=tabela.c.saldo + (entradas - despesas)
+    ))
+
+@event.listens_for(db.session, 'before_flush')
+def _capturar_financeiro_antigo(session, flush_context, instances):
+    """Guarda data/tipo/valor, como estão no banco, das movimentações alteradas ou extornadas"""
+    ids = [o.id for o in list(session.dirty) + list(session.deleted)
+           if isinstance(o, Financeiro) and o.id is not None]
+    antigos = {}
+    if ids:
+        tabela = Financeiro.__table__
+        for linha in session.connection().execute(
+            select(tabela.c.id, tabela.c.data, tabela.c.tipo, tabela.c.valor).where(tabela.c.id.in_(ids))
+        ):
+            antigos[linha.id] = linha
+    session.info['financeiro_antigo'] = antigos
+
+@event.listens_for(db.session, 'after_flush')
+def _atualizar_saldo_diario(session, flush_context):
+    antigos = session.info.pop('financeiro_antigo', {})
+    # Agrupa por dia: um lote de lançamentos na mesma data atualiza saldo_diario uma vez
+    por_dia = {}
+
+    for obj in session.new:
+        if isinstance(obj, Financeiro):
+            _acumular_movimento(por_dia, obj.data, obj.tipo, obj.valor, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Financeiro) and obj.id in antigos:
+            antigo = antigos[obj.id]
+            _acumular_movimento(por_dia, antigo.data, antigo.tipo, antigo.valor, -1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Financeiro) and obj.id in antigos and obj not in session.deleted:
+            antigo = antigos[obj.id]
+            novo = {c: _valor_novo(obj, c, antigo._mapping) for c in ('data', 'tipo', 'valor')}
+            if (novo['data'], novo['tipo'], novo['valor']) != (antigo.data, antigo.tipo, antigo.valor):
+                _acumular_movimento(por_dia, antigo.data, antigo.tipo, antigo.valor, -1)
+                _acumular_movimento(por_dia, novo['data'], novo['tipo'], novo['valor'], 1)
+
+    conexao = session.connection()
+    for data in sorted(por_dia):
+        _lancar_saldo_diario(conexao, data, *por_dia[data])
+
+def recalcular_saldos_diarios():
+    """Reconstrói saldo_diario a partir de todas as movimentações (backfill/conferência)"""
+    por_dia = db.session.query(
+        Financeiro.data,
+        db.func.sum(db.case((Financeiro.tipo != 'DESPESA', Financeiro.valor), else_=0)),
+        db.func.sum(db.case((Financeiro.tipo == 'DESPESA', Financeiro.valor), else_=0)),
+    ).group_by(Financeiro.data).order_by(Financeiro.data).all()
+
+    linhas = []
+    saldo = 0
+    for data, entradas, despesas in por_dia:
+        saldo += (entradas or 0) - (despesas or 0)
+        linhas.append({'data': data, 'entradas': entradas or 0, 'despesas': despesas or 0, 'saldo': saldo})
+
+    db.session.execute(SaldoDiario.__table__.delete())
+    if linhas:
+        db.session.execute(insert(SaldoDiario.__table__), linhas)
+    db.session.commit()
+    logger.info(f"Saldo diário recalculado para {len(linhas)} dias")
+    return len(linhas)
+
+def totais_caixa(data_inicio=None, data_fim=None, tipo_filtro=''):
+    """Entradas, despesas e saldo do período somando os fechamentos diários.
+
+    Sem data inicial, os anos fechados inteiros no período vêm de fechamento_anual
+    e só o ano em aberto é somado em saldo_diario.
+    """
+    entradas = despesas = 0
+    if data_inicio is None:
+        entradas, despesas, ultimo_fechado = totais_anos_fechados(data_fim)
+        if ultimo_fechado is not None:
+            data_inicio = date(ultimo_fechado + 1, 1, 1)
+
+    query = db.session.query(db.func.sum(SaldoDiario.entradas), db.func.sum(SaldoDiario.despesas))
+    if data_inicio:
+        query = query.filter(SaldoDiario.data >= data_inicio)
+    if data_fim:
+        query = query.filter(SaldoDiario.data <= data_fim)
+    entradas_abertas, despesas_abertas = query.one()
+    entradas += entradas_abertas or 0
+    despesas += despesas_abertas or 0
+
+    if tipo_filtro == 'entradas':
+        despesas = 0
+    elif tipo_filtro == 'despesas':
+        entradas = 0
+    return entradas, despesas, entradas - despesas
+
+def _banco_suporta_window():
+    """SUM() OVER exige SQLite 3.25+; Postgres sempre suporta"""
+    if db.engine.dialect.name != 'sqlite':
+        return True
+    return sqlite3.sqlite_version_info >= (3, 25, 0)
+
+def saldos_apos_movimentacoes(movs):
+    """Saldo do caixa logo após cada movimentação de `movs` ({id: saldo})"""
+    if not movs:
+        return {}
+    inicio = min(m.data for m in movs)
+    fim = max(m.data for m in movs)
+
+    # Saldo de abertura: fechamento do último dia antes do intervalo
+    abertura = db.session.query(SaldoDiario.saldo).filter(
+        SaldoDiario.data < inicio
+    ).order_by(SaldoDiario.data.desc()).limit(1).scalar() or 0
+
+    # O acumulado considera todas as movimentações do intervalo, inclusive as
+    # ocultas pelo filtro de tipo, para refletir o saldo real do caixa
+    efeito = db.case((Financeiro.tipo == 'DESPESA', -Financeiro.valor), else_=Financeiro.valor)
+    no_intervalo = Financeiro.data.between(inicio, fim)
+
+    if _banco_suporta_window():
+        acumulado = db.session.query(
+            Financeiro.id.label('id'),
+            db.func.sum(efeito).over(order_by=(Financeiro.data, Financeiro.id)).label('acumulado')
+        ).filter(no_intervalo).subquery()
+        linhas = db.session.query(acumulado.c.id, acumulado.c.acumulado).filter(
+            acumulado.c.id.in_([m.id for m in movs])
+        ).all()
+        return {mov_id: abertura + (valor or 0) for mov_id, valor in linhas}
+
+    # Fallback para SQLite antigo: acumula em Python só o intervalo da página
+    saldos = {}
+    saldo = abertura
+    for mov_id, valor in db.session.query(Financeiro.id, efeito).filter(no_intervalo).order_by(
+        Financeiro.data, Financeiro.id
+    ):
+        saldo += valor or 0
+        saldos[mov_id] = saldo
+    return saldos
+
+# ================= FECHAMENTO ANUAL =================
+# Fechar um ano grava, uma única vez, o total por tipo e o resumo do ano
+# (entradas, despesas, saldo em 31/12). A partir daí nenhuma movimentação com
+# data nesse ano pode ser lançada, alterada ou extornada (checado no flush), e
+# os saldos "desde o início" somam o resumo dos anos fechados com uma leitura
+# só do ano em aberto. Os anos são fechados em sequência, sem lacunas.
+
+class PeriodoFechado(ValueError):
+    """Lançamento, alteração ou extorno com data em um ano já fechado"""
+
+    def __init__(self, ano):
+        super().__init__(f"O ano {ano} está fechado: não é possível lançar, alterar ou extornar movimentações nele")
+        self.ano = ano
+
+def ultimo_ano_fechado():
+    return db.session.query(db.func.max(FechamentoAnual.ano)).scalar()
+
+def totais_anos_fechados(ate=None):
+    """(entradas, despesas, último ano) dos anos fechados que terminam até a data `ate`"""
+    query = db.session.query(
+        db.func.sum(FechamentoAnual.entradas), db.func.sum(FechamentoAnual.despesas), db.func.max(FechamentoAnual.ano)
+    )
+    if ate is not None:
+        query = query.filter(FechamentoAnual.ano <= (ate.year if (ate.month, ate.day) == (12, 31) else ate.year - 1))
+    entradas, despesas, ultimo = query.one()
+    return entradas or 0, despesas or 0, ultimo
+
+def verificar_periodo_aberto(*datas):
+    """Levanta PeriodoFechado se alguma das datas cair em um ano fechado"""
+    anos = [d.year for d in datas if d is not None]
+    # O ano corrente nunca está fechado: lançamentos do dia não consultam o banco
+    if not anos or min(anos) >= date.today().year:
+        return
+    ultimo = ultimo_ano_fechado()
+    if ultimo is not None and min(anos) <= ultimo:
+        raise PeriodoFechado(min(anos))
+
+@event.listens_for(db.session, 'before_flush')
+def _bloquear_periodo_fechado(session, flush_context, instances):
+    """Nenhuma movimentação de ano fechado entra, muda ou sai; o fechamento não muda"""
+    datas = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (FechamentoAnual, FechamentoAnualTipo)) and obj not in session.new:
+            if obj in session.deleted or session.is_modified(obj):
+                raise PeriodoFechado(obj.ano)
+        elif isinstance(obj, Financeiro) and (obj not in session.dirty or session.is_modified(obj)):
+            historico = attributes.get_history(obj, 'data')
+            datas.extend(historico.sum())
+    verificar_periodo_aberto(*datas)
+
+def anos_para_fechar():
+    """Anos que podem ser fechados agora: do primeiro em aberto até o ano passado"""
+    ultimo = ultimo_ano_fechado()
+    if ultimo is not None:
+        primeiro = ultimo + 1
+    else:
+        primeira_data = db.session.query(db.func.min(Financeiro.data)).scalar()
+        primeiro = primeira_data.year if primeira_data else date.today().year - 1
+    return list(range(primeiro, date.today().year))
+
+def fechar_ano(ano, usuario=None):
+    """Fecha os anos em aberto até `ano` (inclusive), gravando o resumo de cada um.
+
+    Não faz commit. Retorna a lista de FechamentoAnual criados.
+    """
+    if ano >= date.today().year:
+        raise ValueError("Só é possível fechar anos já encerrados")
+    ultimo = ultimo_ano_fechado()
+    if ultimo is not None and ano <= ultimo:
+        raise ValueError(f"O ano {ano} já está fechado")
+    anos = [a for a in anos_para_fechar() if a <= ano]
+    if not anos:
+        raise ValueError(f"Não há movimentações até {ano} para fechar")
+
+    saldo = db.session.get(FechamentoAnual, ultimo).saldo_final if ultimo is not None else 0
+
+    ano_mov = db.extract('year', Financeiro.data)
+    por_ano = {}
+    for ano_linha, tipo, total, quantidade in db.session.query(
+        ano_mov, Financeiro.tipo, db.func.sum(Financeiro.valor), db.func.count(Financeiro.id)
+    ).filter(
+        Financeiro.data >= date(anos[0], 1, 1),
+        Financeiro.data <= date(ano, 12, 31)
+    ).group_by(ano_mov, Financeiro.tipo):
+        por_ano.setdefault(int(ano_linha), []).append((tipo, total or 0, quantidade))
+
+    fechamentos = []
+    for ano_fechar in anos:
+        tipos = por_ano.get(ano_fechar, [])
+        entradas = sum(total for tipo, total, _ in tipos if tipo != 'DESPESA')
+        despesas = sum(total for tipo, total, _ in tipos if tipo == 'DESPESA')
+        saldo += entradas - despesas
+        fechamento = FechamentoAnual(
+            ano=ano_fechar,
+            entradas=entradas,
+            despesas=despesas,
+            saldo_final=saldo,
+            quantidade=sum(quantidade for _, _, quantidade in tipos),
+            fechado_em=datetime.now(),
+            fechado_por=usuario
+        )
+        db.session.add(fechamento)
+        db.session.add_all([
+            FechamentoAnualTipo(ano=ano_fechar, tipo=tipo, total=total, quantidade=quantidade)
+            for tipo, total, quantidade in tipos
+        ])
+        fechamentos.append(fechamento)
+
+        # Conferência com o fechamento diário do último dia do ano
+        saldo_diario = db.session.query(SaldoDiario.saldo).filter(
+            SaldoDiario.data <= date(ano_fechar, 12, 31)
+        ).order_by(SaldoDiario.data.desc()).limit(1).scalar() or 0
+        if saldo_diario != saldo:
+            logger.warning(f"Fechamento de {ano_fechar}: saldo R$ {saldo} difere de saldo_diario (R$ {saldo_diario})")
+
+    db.session.flush()
+    return fechamentos
+
+# ================= MATRIZ DE MENSALIDADES =================
+# mensalidade_socio tem uma linha por sócio por mês (competência) com o valor
+# devido, o vencimento e se foi paga. Lançar ou extornar uma MENSALIDADE em
+# Financeiro atualiza a linha na mesma transação; as competências são abertas
+# para os sócios ativos ao virar o mês (abrir_competencias_pendentes) e quando um
+# sócio é cadastrado ou reativado. Assim a grade do ano e a lista de
+# inadimplentes são leituras indexadas, sem agrupar o histórico em Python.
+
+MENSALIDADE_VALOR = dinheiro(os.environ.get('MENSALIDADE_VALOR', '50.00'))
+MENSALIDADE_VENCIMENTO_DIA = int(os.environ.get('MENSALIDADE_VENCIMENTO_DIA', 10))
+
+_competencias_abertas = {'ate': None}  # Última competência aberta por este processo
+_trava_competencias = threading.Lock()
+
+def vencimento_mensalidade(ano, mes):
+    return date(ano, mes, min(max(MENSALIDADE_VENCIMENTO_DIA, 1), 28))
+
+def _proxima_competencia(ano, mes):
+    return (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+def _chave_mensalidade(tabela, jogador_id, ano, mes):
+    return (tabela.c.jogador_id == jogador_id) & (tabela.c.ano == ano) & (tabela.c.mes == mes)
+
+def _abrir_competencia(conexao, ano, mes, jogador_ids=None):
+    """Cria a linha em aberto da competência para os sócios ativos que ainda não a têm"""
+    tabela = MensalidadeSocio.__table__
+    jogadores = Jogador.__table__
+    consulta = select(
+        jogadores.c.id,
+        db.literal(ano),
+        db.literal(mes),
+        db.literal(MENSALIDADE_VALOR, Dinheiro),
+        db.literal(vencimento_mensalidade(ano, mes), db.Date),
+        db.literal(False),
+        db.literal(0, Dinheiro),
+    ).where(
+        jogadores.c.tipo == 'SOCIO',
+        jogadores.c.ativo.is_(True),
+        ~select(tabela.c.jogador_id).where(_chave_mensalidade(tabela, jogadores.c.id, ano, mes)).exists(),
+    )
+    if jogador_ids is not None:
+        consulta = consulta.where(jogadores.c.id.in_(jogador_ids))
+    return conexao.execute(insert(tabela).from_select(
+        ['jogador_id', 'ano', 'mes', 'valor', 'vencimento', 'pago', 'valor_pago'], consulta
+    )).rowcount
+
+def abrir_competencias_pendentes(hoje=None):
+    """Abre as competências desde a última aberta até o mês atual (uma vez por mês em cada processo)"""
+    hoje = hoje or date.today()
+    atual = (hoje.year, hoje.month)
+    if _competencias_abertas['ate'] == atual:
+        return 0
+    with _trava_competencias, ler_do_primario():
+        ultima = db.session.query(MensalidadeSocio.ano, MensalidadeSocio.mes).filter(
+            db.or_(MensalidadeSocio.ano < atual[0],
+                   db.and_(MensalidadeSocio.ano == atual[0], MensalidadeSocio.mes <= atual[1]))
+        ).order_by(MensalidadeSocio.ano.desc(), MensalidadeSocio.mes.desc()).first()
+        competencia = tuple(ultima) if ultima else atual
+        conexao = db.session.connection()
+        abertas = 0
+        while competencia <= atual:
+            abertas += _abrir_competencia(conexao, *competencia)
+            competencia = _proxima_competencia(*competencia)
+        db.session.commit()
+        _competencias_abertas['ate'] = atual
+    if abertas:
+        logger.info(f"{abertas} mensalidade(s) em aberto criadas até {atual[1]:02d}/{atual[0]}")
+    return abertas
+
+def _eh_mensalidade(tipo, jogador_id, ano, mes):
+    return tipo == 'MENSALIDADE' and None not in (jogador_id, ano, mes)
+
+def _linha_em_aberto(jogador_id, ano, mes):
+    return {
+        'jogador_id': jogador_id, 'ano': ano, 'mes': mes, 'valor': MENSALIDADE_VALOR,
+        'vencimento': vencimento_mensalidade(ano, mes), 'pago': False, 'valor_pago': 0,
+    }
+
+def _abrir_anteriores(conexao, pagamentos):
+    """Pagamento anterior à primeira competência do sócio: abre também os meses entre
+    ele e essa competência (mesma regra de recalcular_matriz_mensalidades)"""
+    tabela = MensalidadeSocio.__table__
+    jogadores = Jogador.__table__
+    pagas = {}
+    for pagamento in pagamentos:
+        pagas.setdefault(pagamento['jogador_id'], set()).add((pagamento['ano'], pagamento['mes']))
+
+    # Sócios ativos do lote e a primeira competência de cada um, em uma consulta
+    primeira = db.func.min(tabela.c.ano * 100 + tabela.c.mes)
+    socios = conexao.execute(
+        select(jogadores.c.id, primeira)
+        .select_from(jogadores.outerjoin(tabela, tabela.c.jogador_id == jogadores.c.id))
+        .where(jogadores.c.id.in_(pagas), jogadores.c.tipo == 'SOCIO', jogadores.c.ativo.is_(True))
+        .group_by(jogadores.c.id)
+    ).all()
+
+    hoje = date.today()
+    atual = (hoje.year, hoje.month)
+    linhas = []
+    for jogador_id, codigo in socios:
+        fim = divmod(codigo, 100) if codigo else _proxima_competencia(*atual)
+        competencia = min(min(pagas[jogador_id]), atual)
+        while competencia < fim:
+            if competencia not in pagas[jogador_id]:
+                linhas.append(_linha_em_aberto(jogador_id, *competencia))
+            competencia = _proxima_competencia(*competencia)
+    if linhas:
+        conexao.execute(insert(tabela), linhas)
+
+def _pagar_competencias(conexao, pagamentos):
+    """Marca as competências como pagas; pagamentos: dicts com jogador_id, ano, mes,
+    valor_pago, data_pagamento e financeiro_id"""
+    tabela = MensalidadeSocio.__table__
+    _abrir_anteriores(conexao, pagamentos)
+    conexao.execute(_insert_sem_conflito(tabela, conexao), [
+        _linha_em_aberto(p['jogador_id'], p['ano'], p['mes']) for p in pagamentos
+    ])
+    conexao.execute(
+        update(tabela).where(_chave_mensalidade(
+            tabela, bindparam('b_jogador_id'), bindparam('b_ano'), bindparam('b_mes')
+        )).values(
+            pago=True, valor_pago=bindparam('valor_pago'),
+            data_pagamento=bindparam('data_pagamento'), financeiro_id=bindparam('financeiro_id')
+        ),
+        [{'b_jogador_id': p['jogador_id'], 'b_ano': p['ano'], 'b_mes': p['mes'],
+          'valor_pago': p['valor_pago'], 'data_pagamento': p['data_pagamento'],
+          'financeiro_id': p['financeiro_id']} for p in pagamentos]
+    )
+
+def _reabrir_competencias(conexao, reaberturas):
+    """Desfaz o pagamento das competências (só se ainda apontam para o lançamento extornado)"""
+    tabela = MensalidadeSocio.__table__
+    conexao.execute(
+        update(tabela).where(
+            _chave_mensalidade(tabela, bindparam('b_jogador_id'), bindparam('b_ano'), bindparam('b_mes')),
+            tabela.c.financeiro_id == bindparam('b_financeiro_id')
+        ).values(pago=False, valor_pago=0, data_pagamento=None, financeiro_id=None),
+        [{'b_jogador_id': r['jogador_id'], 'b_ano': r['ano'], 'b_mes': r['mes'],
+          'b_financeiro_id': r['financeiro_id']} for r in reaberturas]
+    )
+
+def _competencia_do_lancamento(valores, financeiro_id):
+    """Competência de uma movimentação MENSALIDADE, ou None se não for mensalidade de sócio"""
+    if not _eh_mensalidade(valores['tipo'], valores['jogador_id'], valores['ano_referencia'], valores['mes']):
+        return None
+    return {
+        'jogador_id': valores['jogador_id'], 'ano': valores['ano_referencia'], 'mes': valores['mes'],
+        'valor_pago': valores['valor'], 'data_pagamento': valores['data'], 'financeiro_id': financeiro_id,
+    }
+
+CAMPOS_MENSALIDADE = ('tipo', 'jogador_id', 'ano_referencia', 'mes', 'valor', 'data')
+
+@event.listens_for(db.session, 'before_flush')
+def _capturar_mensalidade_antiga(session, flush_context, instances):
+    """Guarda, como estão no banco, as movimentações que serão alteradas ou extornadas"""
+    ids = [o.id for o in list(session.dirty) + list(session.deleted)
+           if isinstance(o, Financeiro) and o.id is not None]
+    antigas = {}
+    if ids:
+        tabela = Financeiro.__table__
+        colunas = [tabela.c.id] + [tabela.c[c] for c in CAMPOS_MENSALIDADE]
+        for linha in session.connection().execute(select(*colunas).where(tabela.c.id.in_(ids))):
+            antigas[linha.id] = dict(linha._mapping)
+    session.info['mensalidade_antiga'] = antigas
+
+@event.listens_for(db.session, 'after_flush')
+def _atualizar_matriz_mensalidades(session, flush_context):
+    """Marca/desmarca o pagamento em mensalidade_socio e abre o mês para sócios novos ou reativados"""
+    antigas = session.info.pop('mensalidade_antiga', {})
+    pagamentos = []
+    reaberturas = []
+    socios_novos = []
+
+    for obj in session.new:
+        if isinstance(obj, Financeiro):
+            competencia = _competencia_do_lancamento({c: getattr(obj, c) for c in CAMPOS_MENSALIDADE}, obj.id)
+            if competencia:
+                pagamentos.append(competencia)
+        elif isinstance(obj, Jogador) and obj.tipo == 'SOCIO' and obj.ativo is not False:
+            socios_novos.append(obj.id)
+
+    for obj in session.deleted:
+        if isinstance(obj, Financeiro) and obj.id in antigas:
+            competencia = _competencia_do_lancamento(antigas[obj.id], obj.id)
+            if competencia:
+                reaberturas.append(competencia)
+
+    for obj in session.dirty:
+        if obj in session.deleted:
+            continue
+        if isinstance(obj, Financeiro) and obj.id in antigas:
+            antiga = antigas[obj.id]
+            nova = {c: _valor_novo(obj, c, antiga) for c in CAMPOS_MENSALIDADE}
+            if all(nova[c] == antiga[c] for c in CAMPOS_MENSALIDADE):
+                continue
+            competencia = _competencia_do_lancamento(antiga, obj.id)
+            if competencia:
+                reaberturas.append(competencia)
+            competencia = _competencia_do_lancamento(nova, obj.id)
+            if competencia:
+                pagamentos.append(competencia)
+        elif isinstance(obj, Jogador) and obj.tipo == 'SOCIO' and obj.ativo:
+            if any(attributes.get_history(obj, c).has_changes() for c in ('tipo', 'ativo')):
+                socios_novos.append(obj.id)
+
+    # Um statement por tipo de alteração, qualquer que seja o tamanho do lote
+    conexao = session.connection()
+    if reaberturas:
+        _reabrir_competencias(conexao, reaberturas)
+    if pagamentos:
+        _pagar_competencias(conexao, pagamentos)
+    if socios_novos:
+        hoje = date.today()
+        _abrir_competencia(conexao, hoje.year, hoje.month, socios_novos)
+
+def recalcular_matriz_mensalidades(hoje=None):
+    """Reconstrói mensalidade_socio a partir das mensalidades lançadas (backfill/conferência).
+
+    Cada sócio ativo fica com as competências desde a primeira mensalidade paga
+    (ou desde o mês atual, se nunca pagou) até o mês atual.
+    """
+    hoje = hoje or date.today()
+    atual = (hoje.year, hoje.month)
+    linhas = {}
+    for mov_id, jogador_id, ano, mes, valor, data in db.session.query(
+        Financeiro.id, Financeiro.jogador_id, Financeiro.ano_referencia, Financeiro.mes,
+        Financeiro.valor, Financeiro.data
+    ).filter(
+        Financeiro.tipo == 'MENSALIDADE',
+        Financeiro.jogador_id.isnot(None),
+        Financeiro.ano_referencia.isnot(None),
+        Financeiro.mes.isnot(None)
+    ):
+        linhas[(jogador_id, ano, mes)] = {
+            'jogador_id': jogador_id, 'ano': ano, 'mes': mes, 'valor': MENSALIDADE_VALOR,
+            'vencimento': vencimento_mensalidade(ano, mes), 'pago': True, 'valor_pago': valor,
+            'data_pagamento': data, 'financeiro_id': mov_id,
+        }
+
+    primeira_paga = {}
+    for jogador_id, ano, mes in linhas:
+        primeira_paga[jogador_id] = min(primeira_paga.get(jogador_id, (ano, mes)), (ano, mes))
+
+    for (jogador_id,) in db.session.query(Jogador.id).filter(Jogador.tipo == 'SOCIO', Jogador.ativo.is_(True)):
+        competencia = min(primeira_paga.get(jogador_id, atual), atual)
+        while competencia <= atual:
+            ano, mes = competencia
+            linhas.setdefault((jogador_id, ano, mes), {
+                'jogador_id': jogador_id, 'ano': ano, 'mes': mes, 'valor': MENSALIDADE_VALOR,
+                'vencimento': vencimento_mensalidade(ano, mes), 'pago': False, 'valor_pago': 0,
+                'data_pagamento': None, 'financeiro_id': None,
+            })
+            competencia = _proxima_competencia(ano, mes)
+
+    db.session.execute(MensalidadeSocio.__table__.delete())
+    if linhas:
+        db.session.execute(insert(MensalidadeSocio.__table__), list(linhas.values()))
+    db.session.commit()
+    _competencias_abertas['ate'] = atual
+    logger.info(f"Matriz de mensalidades recalculada: {len(linhas)} competências")
+    return len(linhas)
+
+def lancar_mensalidades_em_lote(mes, ano, valor_padrao, valores=None, ignorar=(), data=None):
+    """Lança a mensalidade de mes/ano para os sócios ativos que ainda não a têm.
+
+    valores: {jogador_id: valor} de quem paga diferente do padrão; ignorar: ids que
+    não devem ser lançados agora. Uma consulta descobre quem já tem a competência e
+    um INSERT em lote grava o restante, na transação de quem chama (sem commit).
+    Retorna {'criadas': [(jogador, valor)], 'ja_lancadas': [jogador], 'ignoradas': [jogador]}.
+    """
+    valores = valores or {}
+    data = data or date.today()
+    nome_mes = MESES[mes - 1]
+    socios = db.session.query(Jogador, Financeiro.id).outerjoin(Financeiro, db.and_(
+        Financeiro.jogador_id == Jogador.id,
+        Financeiro.tipo == 'MENSALIDADE',
+        Financeiro.ano_referencia == ano,
+        Financeiro.mes == mes
+    )).filter(
+        Jogador.tipo == 'SOCIO',
+        Jogador.ativo.is_(True)
+    ).order_by(Jogador.nome).all()
+
+    resumo = {'criadas': [], 'ja_lancadas': [], 'ignoradas': []}
+    novas = []
+    for jogador, mensalidade_id in socios:
+        if mensalidade_id:
+            resumo['ja_lancadas'].append(jogador)
+        elif jogador.id in ignorar:
+            resumo['ignoradas'].append(jogador)
+        else:
+            valor = valores.get(jogador.id, valor_padrao)
+            novas.append(Financeiro(
+                data=data,
+                tipo='MENSALIDADE',
+                descricao=f"Mensalidade {nome_mes}/{ano} - {jogador.nome}",
+                valor=valor,
+                jogador_id=jogador.id,
+                mes_referencia=f"{nome_mes}/{ano}",
+                ano_referencia=ano,
+                mes=mes
+            ))
+            resumo['criadas'].append((jogador, valor))
+
+    db.session.add_all(novas)
+    db.session.flush()
+    return resumo
+
+# ================= EXTRATO PAGINADO =================
+# Paginação por cursor (keyset) em (data, id): cada página é uma busca por
+# intervalo no índice, com custo independente de quantas páginas já passaram.
+
+FINANCEIRO_POR_PAGINA = int(os.environ.get('FINANCEIRO_POR_PAGINA', '50'))
+FINANCEIRO_POR_PAGINA_MAX = 500
+
+def ler_cursor_extrato(valor):
+    """Converte 'AAAA-MM-DD_id' em (data, id); None se ausente ou inválido"""
+    try:
+        data_str, mov_id = valor.split('_')
+        return date.fromisoformat(data_str), int(mov_id)
+    except (AttributeError, ValueError):
+        return None
+
+def formatar_cursor_extrato(mov):
+    return f"{mov.data.isoformat()}_{mov.id}"
+
+def paginar_extrato(query, antes=None, depois=None, por_pagina=FINANCEIRO_POR_PAGINA):
+    """Página do extrato, mais recentes primeiro, a partir de um cursor (data, id)
+
+    `antes` traz as movimentações mais antigas que o cursor e `depois` as mais
+    recentes. Retorna as movimentações e os cursores das páginas vizinhas.
+    """
+    if depois:
+        data_cursor, id_cursor = depois
+        query = query.filter(db.or_(
+            Financeiro.data > data_cursor,
+            db.and_(Financeiro.data == data_cursor, Financeiro.id > id_cursor)
+        ))
+        movs = query.order_by(Financeiro.data.asc(), Financeiro.id.asc()).limit(por_pagina + 1).all()
+        tem_mais_recentes = len(movs) > por_pagina
+        movs = list(reversed(movs[:por_pagina]))
+        tem_mais_antigas = True
+    else:
+        if antes:
+            data_cursor, id_cursor = antes
+            query = query.filter(db.or_(
+                Financeiro.data < data_cursor,
+                db.and_(Financeiro.data == data_cursor, Financeiro.id < id_cursor)
+            ))
+        movs = query.order_by(Financeiro.data.desc(), Financeiro.id.desc()).limit(por_pagina + 1).all()
+        tem_mais_antigas = len(movs) > por_pagina
+        movs = movs[:por_pagina]
+        tem_mais_recentes = antes is not None
+
+    return {
+        'movs': movs,
+        'cursor_mais_antigas': formatar_cursor_extrato(movs[-1]) if movs and tem_mais_antigas else None,
+        'cursor_mais_recentes': formatar_cursor_extrato(movs[0]) if movs and tem_mais_recentes else None,
+    }
+
 # ================= INICIALIZAÇÃO DO BANCO =================
+
+def descrever_pool(engine):
+    """Resumo do pool efetivo de um engine (lido do próprio pool), para o log de inicialização"""
+    workers, threads = gunicorn_workers_threads()
+    pool = engine.pool
+    descricao = (
+        f"Pool do banco ({engine.dialect.name}): {type(pool).__name__}"
+        f" pool_pre_ping={pool._pre_ping} pool_recycle={pool._recycle}s"
+    )
+    if hasattr(pool, 'size'):
+        max_overflow = getattr(pool, '_max_overflow', 0)
+        maximo = pool.size() + max_overflow
+        descricao += (
+            f" pool_size={pool.size()} max_overflow={max_overflow}"
+            f"; Gunicorn {workers} worker(s) x {threads} thread(s): até {workers * maximo} conexões"
+        )
+    connect_args = opcoes_engine(engine.url.render_as_string(hide_password=False)).get('connect_args')
+    if connect_args:
+        descricao += f"; {connect_args['options']}"
+    return descricao
+
 with app.app_context():
+    logger.info(descrever_pool(db.engine))
+    if db_read_url:
+        logger.info("Réplica de leitura ativa - " + descrever_pool(db.engines['replica']))
     try:
         db.create_all()
 
@@ -208,30 +1867,36 @@ with app.app_context():
             db.session.add(admin)
             db.session.commit()
             logger.info("Usuario admin criado com sucesso")
+
+        # Popula estatistica_jogador na primeira subida após a criação da tabela
+        if not EstatisticaJogador.query.first() and (Participacao.query.first() or Jogo.query.filter(Jogo.craque_id.isnot(None)).first()):
+            recalcular_estatisticas_jogadores()
+
+        # Idem para saldo_diario
+        if not SaldoDiario.query.first() and Financeiro.query.first():
+            recalcular_saldos_diarios()
+
+        # Idem para mensalidade_socio; depois abre as competências até o mês atual
+        if not MensalidadeSocio.query.first() and Jogador.query.filter_by(tipo='SOCIO').first():
+            recalcular_matriz_mensalidades()
+        abrir_competencias_pendentes()
+        garantir_versoes_dados()
     except Exception as e:
         db.session.rollback()
         logger.error(f"Erro na inicialização do banco: {e}")
 
 # ================= VALIDAÇÕES E UTILITÁRIOS =================
 
-def forcar_refresh_banco():
-    """Força o SQLAlchemy a buscar dados atualizados do banco"""
-    try:
-        db.session.expire_all()
-        # Remove flush() para evitar problemas de transação
-        logger.info("Refresh do banco forçado com sucesso")
-    except Exception as e:
-        db.session.rollback()
-        logger.error(f"Erro ao forçar refresh do banco: {e}")
-
 def validar_valor(valor_str):
-    """Valida e converte valor monetário"""
+    """Valida e converte valor monetário (Decimal com duas casas)"""
     try:
-        valor = float(valor_str)
+        valor = dinheiro(str(valor_str).strip().replace(',', '.'))
+        if not valor.is_finite():
+            raise ValueError("Valor inválido")
         if valor < 0:
             raise ValueError("Valor não pode ser negativo")
         return valor
-    except (ValueError, TypeError):
+    except (ValueError, TypeError, InvalidOperation):
         raise ValueError("Valor inválido")
 
 def validar_data(data_str):
@@ -241,6 +1906,22 @@ def validar_data(data_str):
     except (ValueError, TypeError):
         raise ValueError("Data inválida")
 
+MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+         'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+MESES_ABREVIADOS = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun',
+                    'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+_NUMERO_DO_MES = {nome.lower(): numero for numero, nome in enumerate(MESES, start=1)}
+_NUMERO_DO_MES['marco'] = 3
+
+def validar_mes(mes):
+    """Converte 'Janeiro', 'janeiro', '01' ou '1' no número do mês (1-12)"""
+    mes = str(mes or '').strip()
+    if mes.isdigit() and 1 <= int(mes) <= 12:
+        return int(mes)
+    if mes.lower() in _NUMERO_DO_MES:
+        return _NUMERO_DO_MES[mes.lower()]
+    raise ValueError("Mês inválido")
+
 def validar_tipo_jogador(tipo):
     """Valida tipo de jogador"""
     tipos_validos = ['SOCIO', 'CONVIDADO']
@@ -249,6 +1930,32 @@ def validar_tipo_jogador(tipo):
     return tipo
 
 
+def _valores_presenca_do_formulario(participacao_id, form):
+    """Campos de uma participação como o admin os enviou no formulário de presenças"""
+    pagou = f'pagou_{participacao_id}' in form
+    valor_pago = 0
+    if pagou:
+        # Validar valor pago
+        try:
+            valor_pago = validar_valor(form.get(f'valor_{participacao_id}') or '0')
+        except ValueError:
+            valor_pago = 0
+
+    # Dados técnicos (gols, expulsões)
+    try:
+        gols = max(0, int(form.get(f'gols_{participacao_id}') or '0'))
+    except ValueError:
+        gols = 0
+
+    return {
+        'confirmou': f'confirmou_{participacao_id}' in form,
+        'pagou': pagou,
+        'valor_pago': valor_pago,
+        'gols': gols,
+        'expulso': f'expulso_{participacao_id}' in form,
+    }
+
+
 # ================= ROTAS =================
 
 @app.route('/pwa/')
@@ -303,28 +2010,11 @@ def index():
     logger.info(f"Acessando dashboard - Usuário: {current_user.username}")
     
     try:
-        # Forçar refresh do banco para garantir dados atualizados
-        forcar_refresh_banco()
-        
-        # Buscar dados atualizados financeiros
-        mensal = db.session.query(db.func.sum(Financeiro.valor)).filter(
-            Financeiro.tipo == 'MENSALIDADE'
-        ).scalar() or 0
-        
-        partidas = db.session.query(db.func.sum(Financeiro.valor)).filter(
-            Financeiro.tipo == 'PARTIDA'
-        ).scalar() or 0
-        
-        despesas = db.session.query(db.func.sum(Financeiro.valor)).filter(
-            Financeiro.tipo == 'DESPESA'
-        ).scalar() or 0
-        
-        saldo = mensal + partidas - despesas
+        # Totais por tipo e artilharia (cache invalidado a cada gravação no caixa/partidas)
+        resumo = resumo_dashboard()
         
         # Próximo jogo
-        proximo_jogo = Jogo.query.filter(
-            Jogo.data >= date.today()
-        ).order_by(Jogo.data.asc()).first()
+        proximo_jogo = proximo_jogo_em_cache()
         
         # Calcular dias até o próximo jogo
         if proximo_jogo:
@@ -332,34 +2022,14 @@ def index():
         else:
             dias_proximo_jogo = None
         
-        # Dados da artilharia
-        artilharia = []
-        jogadores = Jogador.query.all()
-        
-        for jogador in jogadores:
-            total_gols = db.session.query(db.func.sum(Participacao.gols)).filter(
-                Participacao.jogador_id == jogador.id
-            ).scalar() or 0
-            
-            if total_gols > 0:
-                artilharia.append({
-                    'nome': jogador.nome,
-                    'gols': total_gols
-                })
-        
-        # Ordenar por quantidade de gols (maior para menor)
-        artilharia.sort(key=lambda x: x['gols'], reverse=True)
-        
-        # Pegar apenas os top 10 para o gráfico
-        top_artilheiros = artilharia[:10]
-        
         logger.info(f"Dashboard carregado com sucesso para {current_user.username}")
         return render_template('index.html', 
-                             saldo=saldo, 
-                             mensal=mensal, 
-                             partidas=partidas, 
-                             despesas=despesas,
-                             artilharia=top_artilheiros,
+                             saldo=resumo['saldo'], 
+                             mensal=resumo['mensal'], 
+                             partidas=resumo['partidas'], 
+                             entradas=resumo['entradas'],
+                             despesas=resumo['despesas'],
+                             artilharia=resumo['artilharia'],
                              proximo_jogo=proximo_jogo,
                              dias_proximo_jogo=dias_proximo_jogo)
     except Exception as e:
@@ -369,6 +2039,7 @@ def index():
                              saldo=0, 
                              mensal=0, 
                              partidas=0, 
+                             entradas=0,
                              despesas=0,
                              artilharia=[],
                              proximo_jogo=None)
@@ -376,12 +2047,10 @@ def index():
 @app.route('/jogos', methods=['GET', 'POST'], strict_slashes=False)
 @app.route('/jogos/', methods=['GET', 'POST'], strict_slashes=False)
 @login_required
+@resposta_condicional('jogo')
 def jogos():
     """Lista e cria jogos"""
     try:
-        # Forçar refresh do banco para garantir dados atualizados
-        forcar_refresh_banco()
-        
         if request.method == 'POST':
             # Verificar permissão - apenas admins podem criar jogos
             if not current_user.is_admin():
@@ -425,9 +2094,8 @@ def jogos():
                 logger.error(f"Erro ao criar jogo: {e}")
         
         # GET - Listar jogos
-        lista_jogos = Jogo.query.order_by(Jogo.data.desc()).all()
         return render_template('jogos.html', 
-                             jogos=lista_jogos,
+                             jogos=lista_jogos(),
                              data_atual=date.today().isoformat(),
                              adversario_padrao="",
                              local_padrao="Campo da UFPA")
@@ -439,18 +2107,16 @@ def jogos():
 
 @app.route('/presencas/<int:jogo_id>', methods=['GET', 'POST'])
 @login_required
+@resposta_condicional('jogo', 'participacao', 'jogador', 'financeiro')
 def presencas(jogo_id):
     """Gerencia presenças e pagamentos de um jogo"""
     try:
         logger.info(f"Acessando presenças do jogo {jogo_id} - Usuário: {current_user.username}")
         
-        # Forçar refresh do banco para garantir dados atualizados
-        forcar_refresh_banco()
-        
         jogo = Jogo.query.get_or_404(jogo_id)
         logger.info(f"Jogo encontrado: {jogo.adversario} em {jogo.data}")
         
-        participacoes = Participacao.query.filter_by(jogo_id=jogo_id).all()
+        participacoes = Participacao.query.options(PARTICIPACAO_COM_JOGADOR).filter_by(jogo_id=jogo_id).all()
         
         # Filter out participations with invalid player references (defensive programming)
         participacoes_validas = []
@@ -575,6 +2241,7 @@ def presencas(jogo_id):
                     # Buscar e remover despesa
                     despesa = Financeiro.query.get(despesa_id)
                     if despesa and despesa.tipo == 'DESPESA':
+                        verificar_periodo_aberto(despesa.data)
                         db.session.delete(despesa)
                         db.session.commit()
                         flash('Despesa removida com sucesso!', 'success')
@@ -584,8 +2251,13 @@ def presencas(jogo_id):
                     
                     return redirect(url_for('presencas', jogo_id=jogo_id))
                 
-                # Lógica para atualizar presenças com verificação de permissões
+                # Lógica para atualizar presenças com verificação de permissões.
+                # Só recebem atribuição os campos que mudaram em relação ao que foi
+                # carregado: participações iguais não ficam sujas, e o flush grava as
+                # alteradas em UPDATEs agrupados (executemany) em vez de reescrever o jogo todo.
                 logger.info("Atualizando presenças existentes")
+                alteradas = 0
+                lancamentos = []
                 for p in participacoes:
                     # Se não for admin, só permitir editar própria confirmação
                     if not current_user.is_admin():
@@ -594,56 +2266,49 @@ def presencas(jogo_id):
                             continue  # Pular outros jogadores
                         
                         # Jogadores só podem confirmar própria presença
-                        if f'confirmou_{p.id}' in request.form:
-                            p.confirmou = True
-                            flash('Sua presença foi confirmada!', 'success')
-                            logger.info(f"Jogador {current_user.jogador_id} confirmou presença no jogo {jogo_id}")
-                        else:
-                            # Se o checkbox não foi enviado, significa que desmarcou
-                            p.confirmou = False
-                            logger.info(f"Jogador {current_user.jogador_id} desmarcou presença no jogo {jogo_id}")
+                        # (checkbox ausente no formulário significa que desmarcou)
+                        confirmou = f'confirmou_{p.id}' in request.form
+                        if bool(p.confirmou) != confirmou:
+                            p.confirmou = confirmou
+                            alteradas += 1
+                            if confirmou:
+                                flash('Sua presença foi confirmada!', 'success')
+                                logger.info(f"Jogador {current_user.jogador_id} confirmou presença no jogo {jogo_id}")
+                            else:
+                                logger.info(f"Jogador {current_user.jogador_id} desmarcou presença no jogo {jogo_id}")
                         
                         # Não permitir editar outros campos
                         continue
                     
                     # Admin pode editar todos os campos
-                    p.confirmou = f'confirmou_{p.id}' in request.form
-                    p.pagou = f'pagou_{p.id}' in request.form
-                    
-                    # Se não pagou, zerar valor
-                    if not p.pagou:
-                        p.valor_pago = 0
-                    else:
-                        # Validar valor pago
-                        valor_str = request.form.get(f'valor_{p.id}') or '0'
-                        try:
-                            p.valor_pago = validar_valor(valor_str)
-                        except ValueError:
-                            p.valor_pago = 0
-
-                    # Atualizar dados técnicos (gols, expulsões)
-                    gols_str = request.form.get(f'gols_{p.id}') or '0'
-                    try:
-                        p.gols = max(0, int(gols_str))
-                    except ValueError:
-                        p.gols = 0
-                    
-                    p.expulso = f'expulso_{p.id}' in request.form
+                    novos = _valores_presenca_do_formulario(p.id, request.form)
 
                     # Lógica Financeira: Só lança se pagou e ainda não foi lançado
-                    if p.pagou and p.valor_pago > 0 and not p.lancado_financeiro:
-                        db.session.add(Financeiro(
+                    if novos['pagou'] and novos['valor_pago'] > 0 and not p.lancado_financeiro:
+                        lancamentos.append(Financeiro(
                             data=date.today(),
                             tipo='PARTIDA',
                             descricao=f"Pgto Jogo {jogo.data.strftime('%d/%m/%Y')} - {p.jogador.nome}",
-                            valor=p.valor_pago
+                            valor=novos['valor_pago'],
+                            jogo_id=jogo.id
                         ))
-                        p.lancado_financeiro = True
-                        logger.info(f"Lançado financeiro para jogador {p.jogador.nome}: R${p.valor_pago}")
+                        novos['lancado_financeiro'] = True
+                        logger.info(f"Lançado financeiro para jogador {p.jogador.nome}: R${novos['valor_pago']}")
+
+                    mudancas = {campo: valor for campo, valor in novos.items() if getattr(p, campo) != valor}
+                    for campo, valor in mudancas.items():
+                        setattr(p, campo, valor)
+                    alteradas += bool(mudancas)
+
+                # Pagamentos da partida entram no mesmo flush, em lote
+                db.session.add_all(lancamentos)
                 
                 # Atualizar craque da partida
                 craque_id = request.form.get('craque_id')
-                jogo.craque_id = int(craque_id) if craque_id and craque_id.isdigit() else None
+                craque_id = int(craque_id) if craque_id and craque_id.isdigit() else None
+                if jogo.craque_id != craque_id:
+                    jogo.craque_id = craque_id
+                logger.info(f"{alteradas} participação(ões) alterada(s), {len(lancamentos)} pagamento(s) lançado(s)")
                 
                 # Adicionar Despesa do Jogo
                 desc_despesa = request.form.get('desc_despesa', '').strip()
@@ -656,7 +2321,8 @@ def presencas(jogo_id):
                             data=date.today(),
                             tipo='DESPESA',
                             descricao=f"Despesa Jogo {jogo.data.strftime('%d/%m/%Y')}: {desc_despesa}",
-                            valor=valor_despesa
+                            valor=valor_despesa,
+                            jogo_id=jogo.id
                         ))
                         logger.info(f"Despesa adicionada: {desc_despesa} - R${valor_despesa}")
                     except ValueError as e:
@@ -681,10 +2347,7 @@ def presencas(jogo_id):
         total_confirmados = sum(1 for p in participacoes if p.confirmou)
         
         # Buscar despesas da partida
-        data_jogo = jogo.data.strftime('%d/%m/%Y')
-        despesas_partida = Financeiro.query.filter(
-            Financeiro.descricao.like(f"Despesa Jogo {data_jogo}%")
-        ).all()
+        despesas_partida = Financeiro.query.filter_by(jogo_id=jogo.id, tipo='DESPESA').all()
         
         # Calcular total de despesas reais (apenas despesas cadastradas)
         total_despesas = sum(d.valor for d in despesas_partida)
@@ -769,10 +2432,14 @@ def extornar_despesa(despesa_id):
         return redirect(request.referrer or url_for('jogos'))
     
     try:
+        verificar_periodo_aberto(despesa.data)
         db.session.delete(despesa)
         db.session.commit()
         flash('Despesa extornada com sucesso!', 'success')
         logger.info(f"Despesa {despesa_id} extornada")
+    except PeriodoFechado as e:
+        db.session.rollback()
+        flash(str(e), 'warning')
     except Exception as e:
         db.session.rollback()
         flash('Erro ao extornar despesa', 'danger')
@@ -781,11 +2448,12 @@ def extornar_despesa(despesa_id):
     return redirect(url_for('jogos'))
 
 @app.route('/pdf-partida/<int:jogo_id>')
+@pdf_em_cache('jogo', 'participacao', 'jogador', 'financeiro')
 def pdf_partida(jogo_id):
     """Gera PDF com dados completos da partida"""
     try:
-        jogo = Jogo.query.get_or_404(jogo_id)
-        participacoes = Participacao.query.filter_by(jogo_id=jogo_id).all()
+        jogo = Jogo.query.options(JOGO_COM_CRAQUE).get_or_404(jogo_id)
+        participacoes = Participacao.query.options(PARTICIPACAO_COM_JOGADOR).filter_by(jogo_id=jogo_id).all()
         
         # Criar buffer para PDF
         from io import BytesIO
@@ -816,6 +2484,8 @@ def pdf_partida(jogo_id):
             ['Data:', jogo.data.strftime('%d/%m/%Y')],
             ['Local:', jogo.local or 'Não informado']
         ]
+        if jogo.tem_placar:
+            info_data.append(['Placar:', jogo.placar_texto])
         
         info_table = Table(info_data, colWidths=[2*inch, 3*inch])
         info_table.setStyle(TableStyle([
@@ -840,10 +2510,8 @@ def pdf_partida(jogo_id):
         
         # Calcular total de despesas (reutilizar variável que será usada depois)
         data_jogo = jogo.data.strftime('%d/%m/%Y')
-        despesas_partida = Financeiro.query.filter(
-            Financeiro.descricao.like(f"Despesa Jogo {data_jogo}%")
-        ).all()
-        total_despesas = sum(float(d.valor) if d.valor else 0.0 for d in despesas_partida)
+        despesas_partida = Financeiro.query.filter_by(jogo_id=jogo.id, tipo='DESPESA').all()
+        total_despesas = sum(d.valor or 0 for d in despesas_partida)
         
         # Calcular saldo
         saldo = total_arrecadado - total_despesas
@@ -1021,7 +2689,7 @@ def resumo_jogo(jogo_id):
     """Resumo técnico do jogo (gols, expulsões, craque)"""
     jogo = Jogo.query.get_or_404(jogo_id)
     # APENAS quem confirmou presença aparece no resumo técnico
-    presentes = Participacao.query.filter_by(jogo_id=jogo_id, confirmou=True).all()
+    presentes = Participacao.query.options(PARTICIPACAO_COM_JOGADOR).filter_by(jogo_id=jogo_id, confirmou=True).all()
 
     if request.method == 'POST':
         try:
@@ -1140,7 +2808,7 @@ def cadastrar_senha_socio():
             User.jogador_id.is_(None)
         ).all()
         
-        socios_com_user = db.session.query(Jogador).join(User).filter(
+        socios_com_user = db.session.query(Jogador).join(User).options(contains_eager(Jogador.user)).filter(
             Jogador.tipo == 'SOCIO'
         ).all()
         
@@ -1161,9 +2829,6 @@ def cadastrar_senha_socio():
 def jogadores():
     """Lista e cadastra jogadores"""
     try:
-        # Forçar refresh do banco para garantir dados atualizados
-        forcar_refresh_banco()
-        
         if request.method == 'POST':
             # Verificar permissão para operações de escrita
             if not current_user.is_admin():
@@ -1340,6 +3005,21 @@ def associados():
     filtro_ano = request.args.get('ano', '')
     filtro_socio = request.args.get('socio_id', '')
     
+    # Validar filtros antes da consulta: o mês aceita o nome (links antigos com
+    # ?mes=Janeiro) e vira o número; valor inválido é ignorado com aviso
+    if filtro_mes:
+        try:
+            filtro_mes = str(validar_mes(filtro_mes))
+        except ValueError:
+            flash(f'Filtro de mês inválido ignorado: {filtro_mes}', 'warning')
+            filtro_mes = ''
+    if filtro_ano and not filtro_ano.isdigit():
+        flash(f'Filtro de ano inválido ignorado: {filtro_ano}', 'warning')
+        filtro_ano = ''
+    if filtro_socio and not filtro_socio.isdigit():
+        flash('Filtro de sócio inválido ignorado', 'warning')
+        filtro_socio = ''
+    
     if request.method == 'POST':
         # Verificar permissão - apenas admins podem lançar mensalidades
         if not current_user.is_admin():
@@ -1365,6 +3045,9 @@ def associados():
                 flash('Ano inválido', 'danger')
                 return redirect(url_for('associados'))
             
+            mes_int = validar_mes(mes)
+            mes = MESES[mes_int - 1]
+            
             valor = validar_valor(valor_str)
             jogador = Jogador.query.get(int(jogador_id))
             
@@ -1372,13 +3055,13 @@ def associados():
                 flash('Jogador não encontrado', 'danger')
                 return redirect(url_for('associados'))
             
-            # Verificar se já existe mensalidade para este mês/ano/jogador
+            # Verificar se já existe mensalidade para este mês/ano/jogador (uq_financeiro_mensalidade)
             mes_ano = f"{mes}/{ano}"
-            mensalidade_existente = Financeiro.query.filter_by(
+            mensalidade_existente = db.session.query(Financeiro.id).filter_by(
                 tipo='MENSALIDADE',
                 jogador_id=jogador.id,
-                mes_referencia=mes_ano,
-                ano_referencia=ano_int
+                ano_referencia=ano_int,
+                mes=mes_int
             ).first()
             
             if mensalidade_existente:
@@ -1393,20 +3076,13 @@ def associados():
                 valor=valor,
                 jogador_id=jogador.id,
                 mes_referencia=mes_ano,
-                ano_referencia=ano_int
+                ano_referencia=ano_int,
+                mes=mes_int
             )
             
             db.session.add(nova_mensalidade)
             db.session.commit()
             
-            # Verificar se a mensalidade foi realmente salva
-            mensalidade_salva = Financeiro.query.filter_by(id=nova_mensalidade.id).first()
-            logger.info(f"Mensalidade salva no banco: {mensalidade_salva}")
-            
-            # Forçar refresh para garantir que os dados apareçam na lista
-            db.session.refresh(nova_mensalidade)
-            db.session.expire_all()
-            
             flash(f'Mensalidade de {mes}/{ano} para {jogador.nome} lançada com sucesso!', 'success')
             logger.info(f"Mensalidade lançada: {mes}/{ano} - {jogador.nome} - R$ {valor}")
             return redirect(url_for('associados'))
@@ -1414,28 +3090,29 @@ def associados():
         except ValueError as e:
             db.session.rollback()
             flash(f'Erro de validação: {str(e)}', 'danger')
+        except IntegrityError:
+            # Outra requisição lançou a mesma mensalidade entre a verificação e o commit
+            db.session.rollback()
+            flash(f'Mensalidade de {mes}/{ano} já está cadastrada', 'warning')
+            return redirect(url_for('associados'))
         except Exception as e:
             db.session.rollback()
             flash('Erro ao lançar mensalidade', 'danger')
             logger.error(f"Erro ao lançar mensalidade: {e}")
     
     # Construir query base com filtros
-    # Forçar refresh do banco para garantir dados atualizados
-    db.session.expire_all()
-    db.session.flush()
-    
-    query = Financeiro.query.filter_by(tipo='MENSALIDADE')
+    query = Financeiro.query.options(FINANCEIRO_COM_JOGADOR).filter_by(tipo='MENSALIDADE')
     
     # Aplicar filtros se existirem
     if filtro_mes:
-        query = query.filter(Financeiro.mes_referencia.like(f'%{filtro_mes}%'))
+        query = query.filter(Financeiro.mes == int(filtro_mes))
     if filtro_ano:
-        query = query.filter(Financeiro.ano_referencia == int(filtro_ano) if filtro_ano.isdigit() else None)
+        query = query.filter(Financeiro.ano_referencia == int(filtro_ano))
     if filtro_socio:
-        query = query.filter(Financeiro.jogador_id == int(filtro_socio) if filtro_socio.isdigit() else None)
+        query = query.filter(Financeiro.jogador_id == int(filtro_socio))
     
     # Buscar mensalidades filtradas
-    mensalidades_filtradas = query.order_by(Financeiro.ano_referencia.desc(), Financeiro.mes_referencia.desc()).all()
+    mensalidades_filtradas = query.order_by(Financeiro.ano_referencia.desc(), Financeiro.mes.desc()).all()
     
     # Agrupar por sócio
     mensalidades_por_socio = {}
@@ -1452,16 +3129,16 @@ def associados():
         mensalidades_por_socio[socio_id]['total_pago'] += mensalidade.valor
     
     # Obter anos únicos para o filtro
-    anos = sorted(set(
-        m.ano_referencia for m in Financeiro.query.filter_by(tipo='MENSALIDADE')
-        .filter(Financeiro.ano_referencia.isnot(None)).all()
-    ), reverse=True)
+    anos = [ano for (ano,) in db.session.query(Financeiro.ano_referencia).filter(
+        Financeiro.tipo == 'MENSALIDADE',
+        Financeiro.ano_referencia.isnot(None)
+    ).distinct().order_by(Financeiro.ano_referencia.desc())]
     
-    # Obter meses únicos para o filtro
-    meses = sorted(set(
-        m.mes_referencia for m in Financeiro.query.filter_by(tipo='MENSALIDADE')
-        .filter(Financeiro.mes_referencia.isnot(None)).all()
-    ))
+    # Obter meses únicos para o filtro: (número, nome)
+    meses = [(mes, MESES[mes - 1]) for (mes,) in db.session.query(Financeiro.mes).filter(
+        Financeiro.tipo == 'MENSALIDADE',
+        Financeiro.mes.isnot(None)
+    ).distinct().order_by(Financeiro.mes)]
     
     # Calcular total geral (apenas dos filtrados)
     total_geral = sum(dados['total_pago'] for dados in mensalidades_por_socio.values())
@@ -1481,12 +3158,69 @@ def associados():
                          total_geral=total_geral,
                          filtros=filtros_atuais,
                          ano_atual=date.today().year,
-                         mes_atual=date.today().strftime('%B'),
-                         valor_padrao="50.00")
+                         mes_atual=MESES[date.today().month - 1],
+                         valor_padrao=f"{MENSALIDADE_VALOR:.2f}")
 
 
 
+@app.route('/lancar-mensalidades-lote', methods=['POST'])
+@login_required
+def lancar_mensalidades_lote():
+    """Lança um mês para todos os sócios ativos de uma vez (valor padrão + exceções por sócio)"""
+    if not current_user.is_admin():
+        flash('Apenas administradores podem lançar mensalidades', 'danger')
+        return redirect(url_for('associados'))
+    
+    try:
+        mes_int = validar_mes(request.form.get('mes'))
+        ano = request.form.get('ano', '').strip()
+        if not ano.isdigit() or not 2000 <= int(ano) <= 2100:
+            raise ValueError("Ano inválido")
+        ano_int = int(ano)
+        valor_padrao = validar_valor(request.form.get('valor', ''))
+        
+        # Exceções: valor_<id> com valor diferente do padrão; ignorar=<id> para não lançar
+        valores = {}
+        for campo, valor_str in request.form.items():
+            if campo.startswith('valor_') and campo[6:].isdigit() and valor_str.strip():
+                valores[int(campo[6:])] = validar_valor(valor_str)
+        ignorar = {int(i) for i in request.form.getlist('ignorar') if i.isdigit()}
+        
+        resumo = lancar_mensalidades_em_lote(mes_int, ano_int, valor_padrao, valores, ignorar)
+        db.session.commit()
+        
+        mes_ano = f"{MESES[mes_int - 1]}/{ano_int}"
+        criadas = resumo['criadas']
+        total = sum(valor for _, valor in criadas)
+        if criadas:
+            flash(f'{len(criadas)} mensalidade(s) de {mes_ano} lançada(s) - total R$ {total:.2f}', 'success')
+        else:
+            flash(f'Nenhuma mensalidade nova de {mes_ano} para lançar', 'info')
+        if resumo['ja_lancadas']:
+            flash(f"Já lançada(s), mantida(s): {', '.join(j.nome for j in resumo['ja_lancadas'])}", 'warning')
+        if resumo['ignoradas']:
+            flash(f"Não lançada(s) agora: {', '.join(j.nome for j in resumo['ignoradas'])}", 'info')
+        logger.info(
+            f"Mensalidades em lote {mes_ano}: {len(criadas)} criadas (R$ {total}), "
+            f"{len(resumo['ja_lancadas'])} já lançadas, {len(resumo['ignoradas'])} ignoradas"
+        )
+        
+    except ValueError as e:
+        db.session.rollback()
+        flash(f'Erro de validação: {str(e)}', 'danger')
+    except IntegrityError:
+        # Outra requisição lançou a mesma competência para algum sócio durante o lote
+        db.session.rollback()
+        flash('Algumas mensalidades foram lançadas ao mesmo tempo por outra pessoa. Nada foi gravado; tente novamente.', 'warning')
+    except Exception as e:
+        db.session.rollback()
+        flash('Erro ao lançar mensalidades em lote', 'danger')
+        logger.error(f"Erro ao lançar mensalidades em lote: {e}")
+    
+    return redirect(url_for('associados'))
+
 @app.route('/pdf-mensalidades')
+@pdf_em_cache('jogador', 'financeiro')
 def pdf_mensalidades():
     """Gera PDF com controle de mensalidades por sócio e ano"""
     try:
@@ -1503,70 +3237,23 @@ def pdf_mensalidades():
         # Buscar sócios
         socios = Jogador.query.filter_by(tipo='SOCIO').order_by(Jogador.nome).all()
         
-        # Buscar mensalidades
-        query = Financeiro.query.filter_by(tipo='MENSALIDADE')
+        # Competências pagas direto da matriz: (sócio, ano, mês) -> valor
+        query = db.session.query(
+            MensalidadeSocio.jogador_id, Jogador.nome, MensalidadeSocio.ano, MensalidadeSocio.mes,
+            MensalidadeSocio.valor_pago
+        ).join(Jogador, MensalidadeSocio.jogador_id == Jogador.id).filter(MensalidadeSocio.pago.is_(True))
         if filtro_ano and filtro_ano.isdigit():
-            query = query.filter(Financeiro.ano_referencia == int(filtro_ano))
-        
-        mensalidades = query.order_by(Financeiro.ano_referencia.desc(), Financeiro.mes_referencia.desc()).all()
+            query = query.filter(MensalidadeSocio.ano == int(filtro_ano))
         
         # Agrupar mensalidades por sócio e ano
         dados_socios = {}
         anos_disponiveis = set()
         
-        for mens in mensalidades:
-            if mens.jogador_id not in dados_socios:
-                dados_socios[mens.jogador_id] = {
-                    'nome': mens.jogador.nome,
-                    'anos': {}
-                }
-            
-            ano = mens.ano_referencia or 0
+        for jogador_id, nome, ano, mes, valor in query:
+            ano = ano or 0
             anos_disponiveis.add(ano)
-            
-            if ano not in dados_socios[mens.jogador_id]['anos']:
-                dados_socios[mens.jogador_id]['anos'][ano] = {}
-            
-            # Extrair mês do formato "MM/YYYY" ou "Mês/YYYY"
-            mes_ref = mens.mes_referencia or ''
-            mes_num = ''
-            if '/' in mes_ref:
-                mes_nome_completo = mes_ref.split('/')[0]
-                
-                # Mapeamento de nomes para números
-                nome_para_num = {
-                    'Janeiro': '01', 'Fevereiro': '02', 'Março': '03', 'Marco': '03',
-                    'Abril': '04', 'Maio': '05', 'Junho': '06', 'Julho': '07',
-                    'Agosto': '08', 'Setembro': '09', 'Outubro': '10', 'Novembro': '11', 'Dezembro': '12'
-                }
-                
-                # Verificar se é nome do mês ou número
-                if mes_nome_completo in nome_para_num:
-                    mes_num = nome_para_num[mes_nome_completo]
-                    mes_nome = {
-                        '01': 'Jan', '02': 'Fev', '03': 'Mar', '04': 'Abr',
-                        '05': 'Mai', '06': 'Jun', '07': 'Jul', '08': 'Ago',
-                        '09': 'Set', '10': 'Out', '11': 'Nov', '12': 'Dez'
-                    }.get(mes_num, mes_num)
-                elif len(mes_nome_completo) == 2 and mes_nome_completo.isdigit():
-                    mes_num = mes_nome_completo
-                    mes_nome = {
-                        '01': 'Jan', '02': 'Fev', '03': 'Mar', '04': 'Abr',
-                        '05': 'Mai', '06': 'Jun', '07': 'Jul', '08': 'Ago',
-                        '09': 'Set', '10': 'Out', '11': 'Nov', '12': 'Dez'
-                    }.get(mes_num, mes_num)
-                else:
-                    mes_num = mes_nome_completo
-                    mes_nome = mes_nome_completo
-            else:
-                mes_nome = mes_ref
-                mes_num = ''  # Define como vazio se não conseguir extrair
-            
-            dados_socios[mens.jogador_id]['anos'][ano][mes_num] = {
-                'nome': mes_nome,
-                'pago': True,
-                'valor': mens.valor
-            }
+            socio = dados_socios.setdefault(jogador_id, {'nome': nome, 'anos': {}})
+            socio['anos'].setdefault(ano, {})[mes] = valor
         
         # Criar buffer para PDF
         buffer = BytesIO()
@@ -1628,10 +3315,7 @@ def pdf_mensalidades():
                     continue
             
             # Cabeçalho da tabela
-            headers = ['Sócio'] + [
-                ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 
-                     'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-                ][0] + ['Total']
+            headers = ['Sócio'] + MESES_ABREVIADOS + ['Total']
             
             # Dados da tabela
             table_data = [headers]
@@ -1645,11 +3329,11 @@ def pdf_mensalidades():
                 total_ano = 0
                 
                 # Para cada mês
-                for mes_num in ['01', '02', '03', '04', '05', '06', '07', '08', '09', '10', '11', '12']:
-                    if ano in socio['anos'] and mes_num in socio['anos'][ano]:
-                        mes_data = socio['anos'][ano][mes_num]
-                        row.append(f"R$ {mes_data['valor']:.0f}")
-                        total_ano += mes_data['valor']
+                meses_pagos = socio['anos'].get(ano, {})
+                for mes in range(1, 13):
+                    if mes in meses_pagos:
+                        row.append(f"R$ {meses_pagos[mes]:.0f}")
+                        total_ano += meses_pagos[mes]
                     else:
                         row.append('-')
                 
@@ -1822,6 +3506,8 @@ def extornar_movimentacao(movimentacao_id):
             flash('Motivo do extorno é obrigatório', 'warning')
             return redirect(url_for('financeiro'))
         
+        verificar_periodo_aberto(movimentacao.data)
+        
         # Salvar dados originais para auditoria
         import json
         dados_originais = {
@@ -1829,7 +3515,7 @@ def extornar_movimentacao(movimentacao_id):
             'data': movimentacao.data.strftime('%d/%m/%Y'),
             'tipo': movimentacao.tipo,
             'descricao': movimentacao.descricao,
-            'valor': movimentacao.valor,
+            'valor': str(movimentacao.valor),
             'jogador_id': movimentacao.jogador_id
         }
         
@@ -1853,6 +3539,9 @@ def extornar_movimentacao(movimentacao_id):
         flash('Movimentação extornada com sucesso!', 'success')
         logger.info(f"Movimentação extornada: {descricao} - R$ {valor} - Motivo: {motivo}")
         
+    except PeriodoFechado as e:
+        db.session.rollback()
+        flash(str(e), 'warning')
     except Exception as e:
         db.session.rollback()
         flash('Erro ao extornar movimentação', 'danger')
@@ -1874,6 +3563,7 @@ def auditoria():
         return redirect(url_for('financeiro'))
 
 @app.route('/pdf-caixa-periodo')
+@pdf_em_cache('financeiro', 'jogador')
 def pdf_caixa_periodo():
     """Gera PDF com extrato do caixa filtrado por período"""
     try:
@@ -1884,6 +3574,7 @@ def pdf_caixa_periodo():
         
         # Construir query base
         query = Financeiro.query
+        data_inicio = data_fim = None
         
         # Aplicar filtros de data se fornecidos
         if data_inicio_str:
@@ -1911,24 +3602,12 @@ def pdf_caixa_periodo():
         # Executar query ordenada
         movs = query.order_by(Financeiro.data.desc(), Financeiro.id.desc()).all()
         
-        # Calcular totais
-        saldo_atual = 0
-        total_entradas = 0
-        total_despesas = 0
-        movimentacoes = []
+        # Totais do período a partir dos fechamentos diários
+        total_entradas, total_despesas, saldo_atual = totais_caixa(data_inicio, data_fim, tipo_filtro)
         
-        for m in movs:
-            if m.tipo == 'DESPESA':
-                saldo_atual -= m.valor
-                total_despesas += m.valor
-            else:
-                saldo_atual += m.valor
-                total_entradas += m.valor
-                
-            movimentacoes.append({
-                'mov': m,
-                'saldo_acumulado': saldo_atual
-            })
+        # Saldo do caixa após cada movimentação, a partir de saldo_diario
+        saldos = saldos_apos_movimentacoes(movs)
+        movimentacoes = [{'mov': m, 'saldo_acumulado': saldos.get(m.id, 0)} for m in movs]
         
         # Criar buffer para PDF
         from io import BytesIO
@@ -2100,30 +3779,19 @@ def pdf_caixa_periodo():
         return redirect(url_for('financeiro'))
 
 @app.route('/pdf-caixa')
+@pdf_em_cache('financeiro', 'jogador')
 def pdf_caixa():
     """Gera PDF com extrato completo do caixa"""
     try:
         # Buscar todas as movimentações
         movs = Financeiro.query.order_by(Financeiro.data.desc(), Financeiro.id.desc()).all()
         
-        # Calcular totais
-        saldo_atual = 0
-        total_entradas = 0
-        total_despesas = 0
-        movimentacoes = []
+        # Totais do período a partir dos fechamentos diários
+        total_entradas, total_despesas, saldo_atual = totais_caixa()
         
-        for m in movs:
-            if m.tipo == 'DESPESA':
-                saldo_atual -= m.valor
-                total_despesas += m.valor
-            else:
-                saldo_atual += m.valor
-                total_entradas += m.valor
-                
-            movimentacoes.append({
-                'mov': m,
-                'saldo_acumulado': saldo_atual
-            })
+        # Saldo do caixa após cada movimentação, a partir de saldo_diario
+        saldos = saldos_apos_movimentacoes(movs)
+        movimentacoes = [{'mov': m, 'saldo_acumulado': saldos.get(m.id, 0)} for m in movs]
         
         # Criar buffer para PDF
         from io import BytesIO
@@ -2283,9 +3951,6 @@ def pdf_caixa():
 def financeiro():
     """Extrato financeiro com filtro por período"""
     try:
-        # Forçar refresh do banco para garantir dados atualizados
-        forcar_refresh_banco()
-        
         # Parâmetros de filtros da URL
         data_inicio_str = request.args.get('data_inicio', '')
         data_fim_str = request.args.get('data_fim', '')
@@ -2300,6 +3965,7 @@ def financeiro():
         
         # Construir query base
         query = Financeiro.query
+        data_inicio = data_fim = None
         
         # Aplicar filtros de data se fornecidos
         if data_inicio_str:
@@ -2322,27 +3988,31 @@ def financeiro():
         elif tipo_filtro == 'despesas':
             query = query.filter(Financeiro.tipo == 'DESPESA')
         
-        # Executar query ordenada
-        movs = query.order_by(Financeiro.data.desc(), Financeiro.id.desc()).all()
+        # Página atual (cursor sobre data, id) respeitando os filtros
+        por_pagina = request.args.get('por_pagina', FINANCEIRO_POR_PAGINA, type=int)
+        por_pagina = max(1, min(por_pagina, FINANCEIRO_POR_PAGINA_MAX))
+        pagina = paginar_extrato(
+            query,
+            antes=ler_cursor_extrato(request.args.get('antes')),
+            depois=ler_cursor_extrato(request.args.get('depois')),
+            por_pagina=por_pagina
+        )
+        movs = pagina['movs']
         
-        # Calcular saldo acumulado e totais
-        saldo_atual = 0
-        total_entradas = 0
-        total_despesas = 0
-        movimentacoes = []
+        # Totais do período a partir dos fechamentos diários
+        total_entradas, total_despesas, saldo_atual = totais_caixa(data_inicio, data_fim, tipo_filtro)
         
-        for m in movs:
-            if m.tipo == 'DESPESA':
-                saldo_atual -= m.valor
-                total_despesas += m.valor
-            else:
-                saldo_atual += m.valor
-                total_entradas += m.valor
-                
-            movimentacoes.append({
-                'mov': m,
-                'saldo_acumulado': saldo_atual
-            })
+        # Saldo do caixa após cada movimentação da página
+        saldos = saldos_apos_movimentacoes(movs)
+        movimentacoes = [{'mov': m, 'saldo_acumulado': saldos.get(m.id, 0)} for m in movs]
+        
+        # Parâmetros para os links de paginação (mantêm os filtros)
+        paginacao = {
+            'por_pagina': por_pagina,
+            'mais_antigas': pagina['cursor_mais_antigas'],
+            'mais_recentes': pagina['cursor_mais_recentes'],
+            'filtros': {k: v for k, v in filtros.items() if v},
+        }
         
         descricao_entrada_padrao = ""
         valor_entrada_padrao = "100.00"
@@ -2356,6 +4026,7 @@ def financeiro():
                              total_despesas=total_despesas,
                              saldo_atual=saldo_atual,
                              filtros=filtros,
+                             paginacao=paginacao,
                              descricao_entrada_padrao=descricao_entrada_padrao,
                              valor_entrada_padrao=valor_entrada_padrao,
                              descricao_despesa_padrao=descricao_despesa_padrao,
@@ -2371,91 +4042,65 @@ def financeiro():
                              saldo_atual=0,
                              filtros={'data_inicio': '', 'data_fim': '', 'tipo': ''})
 
+@app.route('/fechamento-anual', methods=['GET', 'POST'])
+@login_required
+def fechamento_anual():
+    """Fechamento do ano: resumo imutável por ano e por tipo, e bloqueio do período"""
+    if request.method == 'POST':
+        if not current_user.is_admin():
+            flash('Apenas administradores podem fechar o ano', 'danger')
+            return redirect(url_for('fechamento_anual'))
+        
+        try:
+            ano = request.form.get('ano', '').strip()
+            if not ano.isdigit():
+                raise ValueError("Ano inválido")
+            fechamentos = fechar_ano(int(ano), usuario=current_user.username)
+            
+            import json
+            db.session.add(Auditoria(
+                acao='FECHAMENTO_ANUAL',
+                tabela_afetada='fechamento_anual',
+                registro_id=int(ano),
+                motivo=f"Fechamento de {', '.join(str(f.ano) for f in fechamentos)}",
+                dados_originais=json.dumps([
+                    {'ano': f.ano, 'entradas': str(f.entradas), 'despesas': str(f.despesas),
+                     'saldo_final': str(f.saldo_final), 'quantidade': f.quantidade}
+                    for f in fechamentos
+                ], ensure_ascii=False),
+                usuario=current_user.username
+            ))
+            db.session.commit()
+            
+            anos_fechados = ', '.join(str(f.ano) for f in fechamentos)
+            flash(f'Ano(s) {anos_fechados} fechado(s). Saldo final: R$ {fechamentos[-1].saldo_final:.2f}', 'success')
+            logger.info(f"Fechamento anual de {anos_fechados} por {current_user.username}")
+        except ValueError as e:
+            db.session.rollback()
+            flash(f'Erro de validação: {str(e)}', 'danger')
+        except IntegrityError:
+            db.session.rollback()
+            flash('Este ano acabou de ser fechado por outra pessoa', 'warning')
+        except Exception as e:
+            db.session.rollback()
+            flash('Erro ao fechar o ano', 'danger')
+            logger.error(f"Erro ao fechar o ano: {e}")
+        return redirect(url_for('fechamento_anual'))
+    
+    fechamentos = FechamentoAnual.query.options(joinedload(FechamentoAnual.tipos)).order_by(
+        FechamentoAnual.ano.desc()
+    ).all()
+    return render_template('fechamento_anual.html',
+                         fechamentos=fechamentos,
+                         anos_para_fechar=anos_para_fechar())
+
 @app.route('/ranking')
+@resposta_condicional('participacao', 'jogo', 'jogador')
 def ranking():
     """Página de ranking dos atletas"""
     try:
-        # Forçar refresh do banco para garantir dados atualizados
-        forcar_refresh_banco()
-        
-        # Buscar todos os jogadores
-        jogadores = Jogador.query.all()
-        
-        # Ranking por Presença
-        ranking_presenca = []
-        for jogador in jogadores:
-            participacoes = Participacao.query.filter_by(jogador_id=jogador.id).all()
-            
-            total_jogos = len(participacoes)
-            total_confirmados = sum(1 for p in participacoes if p.confirmou)
-            total_pagos = sum(1 for p in participacoes if p.pagou)
-            pontuacao = total_confirmados + total_pagos
-            
-            # Calcular percentual de presença
-            perc_presenca = (total_confirmados / total_jogos * 100) if total_jogos > 0 else 0
-            
-            if total_jogos > 0:
-                ranking_presenca.append({
-                    'jogador': jogador,
-                    'total_jogos': total_jogos,
-                    'jogos_confirmados': total_confirmados,
-                    'jogos_pagos': total_pagos,
-                    'pontuacao': pontuacao,
-                    'perc_presenca': perc_presenca
-                })
-        
-        # Ordenar por pontuação (maior para menor)
-        ranking_presenca.sort(key=lambda x: x['pontuacao'], reverse=True)
-        
-        # Ranking Financeiro
-        ranking_financeiro = []
-        for jogador in jogadores:
-            participacoes = Participacao.query.filter_by(jogador_id=jogador.id, pagou=True).all()
-            
-            total_pago = sum(p.valor_pago for p in participacoes)
-            jogos_pagos = len(participacoes)
-            media_por_jogo = total_pago / jogos_pagos if jogos_pagos > 0 else 0
-            
-            if total_pago > 0:
-                ranking_financeiro.append({
-                    'jogador': jogador,
-                    'total_pago': total_pago,
-                    'qtd_pagamentos': jogos_pagos,
-                    'media_por_jogo': media_por_jogo
-                })
-        
-        # Ordenar por total pago (maior para menor)
-        ranking_financeiro.sort(key=lambda x: x['total_pago'], reverse=True)
-        
-        # Ranking Técnico
-        ranking_tecnico = []
-        for jogador in jogadores:
-            participacoes = Participacao.query.filter_by(jogador_id=jogador.id).all()
-            
-            total_gols = sum(p.gols or 0 for p in participacoes)
-            total_expulsoes = sum(1 for p in participacoes if p.expulso)
-            
-            # Contar vezes que foi craque
-            craques = Jogo.query.filter_by(craque_id=jogador.id).count()
-            
-            pontuacao = total_gols + craques - total_expulsoes
-            
-            if total_gols > 0 or craques > 0 or total_expulsoes > 0:
-                ranking_tecnico.append({
-                    'jogador': jogador,
-                    'total_gols': total_gols,
-                    'craque_count': craques,
-                    'total_expulsoes': total_expulsoes,
-                    'pontuacao': pontuacao
-                })
-        
-        # Ordenar por pontuação técnica (maior para menor)
-        ranking_tecnico.sort(key=lambda x: x['pontuacao'], reverse=True)
-        
-        return render_template('ranking.html',
-                           ranking_presenca=ranking_presenca,
-                           ranking_financeiro=ranking_financeiro,
-                           ranking_tecnico=ranking_tecnico)
+        limite = request.args.get('limite', type=int)
+        return render_template('ranking.html', limite=limite, **rankings_em_cache(limite))
         
     except Exception as e:
         logger.error(f"Erro ao carregar ranking: {e}")
@@ -2465,6 +4110,116 @@ def ranking():
                            ranking_financeiro=[],
                            ranking_tecnico=[])
 
+# ================= DESEMPENHO POR REQUISIÇÃO =================
+# Conta as consultas SQL, o tempo no banco e a consulta mais lenta de cada
+# requisição. O resultado vai no cabeçalho Server-Timing e é acumulado por
+# endpoint (em memória, por processo) para o relatório em /admin/perf.
+
+ORCAMENTO_PADRAO = {
+    'consultas': int(os.environ.get('ORCAMENTO_CONSULTAS', 50)),
+    'banco_ms': float(os.environ.get('ORCAMENTO_BANCO_MS', 500)),
+}
+# Orçamentos específicos por endpoint (os demais usam ORCAMENTO_PADRAO)
+ORCAMENTO_ROTAS = {
+    'index': {'consultas': 10, 'banco_ms': 200},
+    'ranking': {'consultas': 10, 'banco_ms': 300},
+    'presencas': {'consultas': 30, 'banco_ms': 300},
+    'financeiro': {'consultas': 15, 'banco_ms': 300},
+    'associados': {'consultas': 15, 'banco_ms': 300},
+}
+
+_lock_desempenho = threading.Lock()
+_desempenho_por_rota = {}
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _iniciar_consulta(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('inicio_consulta', []).append(perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _medir_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info['inicio_consulta'].pop()
+    if not has_request_context():
+        return
+    duracao = (perf_counter() - inicio) * 1000
+    sql = g.setdefault('sql', {'consultas': 0, 'banco_ms': 0.0, 'mais_lenta_ms': 0.0, 'mais_lenta': ''})
+    sql['consultas'] += 1
+    sql['banco_ms'] += duracao
+    if duracao > sql['mais_lenta_ms']:
+        sql['mais_lenta_ms'] = duracao
+        sql['mais_lenta'] = ' '.join(statement.split())[:300]
+
+@app.before_request
+def _iniciar_medicao():
+    g.inicio_requisicao = perf_counter()
+
+@app.after_request
+def _registrar_desempenho(response):
+    if 'inicio_requisicao' not in g:
+        return response
+    total_ms = (perf_counter() - g.inicio_requisicao) * 1000
+    sql = g.get('sql') or {'consultas': 0, 'banco_ms': 0.0, 'mais_lenta_ms': 0.0, 'mais_lenta': ''}
+    # URLs sem rota (404, varreduras) vão para um único grupo: o dicionário não cresce sem limite
+    endpoint = request.endpoint or '<sem rota>'
+
+    response.headers['Server-Timing'] = (
+        f'db;dur={sql["banco_ms"]:.1f};desc="{sql["consultas"]} consultas", '
+        f'app;dur={total_ms:.1f}'
+    )
+
+    orcamento = ORCAMENTO_ROTAS.get(endpoint, ORCAMENTO_PADRAO)
+    estourou = sql['consultas'] > orcamento['consultas'] or sql['banco_ms'] > orcamento['banco_ms']
+    if estourou:
+        logger.warning(
+            f"Orçamento excedido em {endpoint} ({request.method} {request.path}): "
+            f"{sql['consultas']} consultas / {sql['banco_ms']:.1f} ms no banco "
+            f"(limite {orcamento['consultas']} / {orcamento['banco_ms']:.0f} ms); "
+            f"mais lenta {sql['mais_lenta_ms']:.1f} ms: {sql['mais_lenta']}"
+        )
+
+    with _lock_desempenho:
+        rota = _desempenho_por_rota.setdefault(endpoint, {
+            'endpoint': endpoint, 'requisicoes': 0, 'consultas': 0, 'max_consultas': 0,
+            'banco_ms': 0.0, 'max_banco_ms': 0.0, 'total_ms': 0.0, 'acima_orcamento': 0,
+            'mais_lenta_ms': 0.0, 'mais_lenta': ''
+        })
+        rota['requisicoes'] += 1
+        rota['consultas'] += sql['consultas']
+        rota['max_consultas'] = max(rota['max_consultas'], sql['consultas'])
+        rota['banco_ms'] += sql['banco_ms']
+        rota['max_banco_ms'] = max(rota['max_banco_ms'], sql['banco_ms'])
+        rota['total_ms'] += total_ms
+        rota['acima_orcamento'] += int(estourou)
+        if sql['mais_lenta_ms'] > rota['mais_lenta_ms']:
+            rota['mais_lenta_ms'] = sql['mais_lenta_ms']
+            rota['mais_lenta'] = sql['mais_lenta']
+    return response
+
+@app.route('/admin/perf', methods=['GET', 'POST'])
+@login_required
+def admin_perf():
+    """Resumo de consultas e tempo de banco por endpoint (deste processo)"""
+    if not current_user.is_admin():
+        flash('Apenas administradores podem ver o desempenho', 'danger')
+        return redirect(url_for('index'))
+
+    if request.method == 'POST':
+        with _lock_desempenho:
+            _desempenho_por_rota.clear()
+        flash('Estatísticas de desempenho zeradas', 'success')
+        return redirect(url_for('admin_perf'))
+
+    with _lock_desempenho:
+        rotas = [dict(rota) for rota in _desempenho_por_rota.values()]
+    for rota in rotas:
+        rota['media_consultas'] = rota['consultas'] / rota['requisicoes']
+        rota['media_banco_ms'] = rota['banco_ms'] / rota['requisicoes']
+        rota['media_total_ms'] = rota['total_ms'] / rota['requisicoes']
+        rota['orcamento'] = ORCAMENTO_ROTAS.get(rota['endpoint'], ORCAMENTO_PADRAO)
+    rotas.sort(key=lambda r: r['banco_ms'], reverse=True)
+
+    return render_template('admin_perf.html', rotas=rotas, processo=os.getpid(),
+                         cache=cache.estatisticas())
+
 # ================= HANDLERS DE ERRO =================
 
 @app.errorhandler(404)
@@ -2495,6 +4250,8 @@ def extornar_mensalidade(mensalidade_id):
             flash('Esta movimentação não é uma mensalidade', 'danger')
             return redirect(url_for('associados'))
         
+        verificar_periodo_aberto(mensalidade.data)
+        
         jogador_nome = mensalidade.jogador.nome if mensalidade.jogador else 'Desconhecido'
         mes_ano = mensalidade.mes_referencia or 'N/A'
         
@@ -2505,12 +4262,63 @@ def extornar_mensalidade(mensalidade_id):
         logger.info(f"Mensalidade extornada: ID {mensalidade_id} - {mes_ano} - {jogador_nome}")
         return redirect(url_for('associados'))
         
+    except PeriodoFechado as e:
+        db.session.rollback()
+        flash(str(e), 'warning')
+        return redirect(url_for('associados'))
     except Exception as e:
         db.session.rollback()
         flash('Erro ao extornar mensalidade', 'danger')
         logger.error(f"Erro ao extornar mensalidade: {e}")
         return redirect(url_for('associados'))
 
+@app.route('/inadimplentes')
+@login_required
+def inadimplentes():
+    """Sócios com mensalidades vencidas e grade de pagamentos do ano (lidos de mensalidade_socio)"""
+    abrir_competencias_pendentes()
+    hoje = date.today()
+    filtro_ano = request.args.get('ano', '')
+    ano = int(filtro_ano) if filtro_ano.isdigit() else hoje.year
+
+    # Devedores: competências em aberto já vencidas (índice pago + vencimento)
+    atrasadas = MensalidadeSocio.query.join(MensalidadeSocio.jogador).options(
+        contains_eager(MensalidadeSocio.jogador)
+    ).filter(
+        MensalidadeSocio.pago.is_(False),
+        MensalidadeSocio.vencimento < hoje
+    ).order_by(Jogador.nome, MensalidadeSocio.ano, MensalidadeSocio.mes).all()
+
+    devedores = {}
+    for competencia in atrasadas:
+        devedor = devedores.setdefault(competencia.jogador_id, {
+            'socio': competencia.jogador, 'competencias': [], 'total': 0
+        })
+        devedor['competencias'].append(competencia)
+        devedor['total'] += competencia.valor
+    devedores = sorted(devedores.values(), key=lambda d: (-d['total'], d['socio'].nome))
+
+    # Grade do ano: uma linha por sócio com as 12 competências
+    grade = {}
+    for competencia in MensalidadeSocio.query.join(MensalidadeSocio.jogador).options(
+        contains_eager(MensalidadeSocio.jogador)
+    ).filter(MensalidadeSocio.ano == ano).order_by(Jogador.nome, MensalidadeSocio.mes):
+        linha = grade.setdefault(competencia.jogador_id, {'socio': competencia.jogador, 'meses': [None] * 12})
+        linha['meses'][competencia.mes - 1] = competencia
+
+    anos = [a for (a,) in db.session.query(MensalidadeSocio.ano).distinct().order_by(MensalidadeSocio.ano.desc())]
+    if ano not in anos:
+        anos.insert(0, ano)
+
+    return render_template('inadimplentes.html',
+                         devedores=devedores,
+                         total_devido=sum(d['total'] for d in devedores),
+                         grade=list(grade.values()),
+                         ano=ano,
+                         anos=anos,
+                         meses=MESES_ABREVIADOS,
+                         vencimento_dia=MENSALIDADE_VENCIMENTO_DIA)
+
 # ================= GERENCIAMENTO DE USUÁRIOS =================
 
 @app.route('/gerenciar-usuarios', methods=['GET'])
@@ -2524,7 +4332,7 @@ def gerenciar_usuarios():
     
     try:
         # Buscar todos os usuários
-        usuarios = User.query.order_by(User.created_at.desc()).all()
+        usuarios = User.query.options(USUARIO_COM_JOGADOR).order_by(User.created_at.desc()).all()
         
         # Buscar jogadores que não têm usuário
         jogadores_com_usuario = [u.jogador_id for u in usuarios if u.jogador_id]
@@ -2633,7 +4441,7 @@ def resetar_senha():
     try:
         if current_user.is_admin():
             # Admin pode resetar senha de qualquer usuário
-            usuarios = User.query.order_by(User.username).all()
+            usuarios = User.query.options(USUARIO_COM_JOGADOR).order_by(User.username).all()
             return render_template('resetar_senha.html', usuarios=usuarios)
         else:
             # Usuário normal só pode resetar própria senha
@@ -2741,7 +4549,7 @@ def placares():
     if request.method == 'GET':
         try:
             # Todos os jogos ordenados por data
-            jogos = Jogo.query.order_by(Jogo.data.desc()).all()
+            jogos = lista_jogos()
             
             # Calcular estatísticas
             estatisticas = calcular_estatisticas_placares()
@@ -2775,9 +4583,9 @@ def placares():
                 flash('Jogo não encontrado', 'danger')
                 return redirect(url_for('placares'))
             
-            # Salvar placar no campo resumo_texto
-            placar_texto = f"{placar_associacao} x {placar_adversario} - {status}"
-            jogo.resumo_texto = placar_texto
+            jogo.gols_pro = int(placar_associacao)
+            jogo.gols_contra = int(placar_adversario)
+            jogo.status = status or 'realizado'
             
             db.session.commit()
             
@@ -2795,7 +4603,7 @@ def placares():
     # GET - mostrar página
     try:
         # Todos os jogos ordenados por data
-        jogos = Jogo.query.order_by(Jogo.data.desc()).all()
+        jogos = lista_jogos()
         
         # Calcular estatísticas
         estatisticas = calcular_estatisticas_placares()
@@ -2819,7 +4627,7 @@ def editar_placar_jogo(jogo_id):
     
     try:
         # Todos os jogos ordenados por data
-        jogos = Jogo.query.order_by(Jogo.data.desc()).all()
+        jogos = lista_jogos()
         
         # Calcular estatísticas
         estatisticas = calcular_estatisticas_placares()
@@ -2855,7 +4663,7 @@ def editar_placar_alternativo(jogo_id):
     
     try:
         # Todos os jogos ordenados por data
-        jogos = Jogo.query.order_by(Jogo.data.desc()).all()
+        jogos = lista_jogos()
         
         # Calcular estatísticas
         estatisticas = calcular_estatisticas_placares()
@@ -2893,9 +4701,9 @@ def salvar_placar():
             flash('Jogo não encontrado', 'danger')
             return redirect(url_for('placares'))
         
-        # Salvar placar no campo resumo_texto
-        placar_texto = f"{placar_associacao} x {placar_adversario} - {status}"
-        jogo.resumo_texto = placar_texto
+        jogo.gols_pro = int(placar_associacao)
+        jogo.gols_contra = int(placar_adversario)
+        jogo.status = status or 'realizado'
         
         db.session.commit()
         
@@ -2911,34 +4719,25 @@ def salvar_placar():
         return redirect(url_for('placares'))
 
 def calcular_estatisticas_placares():
-    """Calcula estatísticas dos jogos realizados usando resumo_texto"""
+    """Estatísticas dos jogos realizados (com cache até o próximo placar gravado)"""
+    return em_cache('placares:estatisticas', ('jogo',), _calcular_estatisticas_placares)
+
+def _calcular_estatisticas_placares():
+    """Calcula estatísticas dos jogos realizados em uma única consulta agregada"""
     try:
-        jogos = Jogo.query.filter(
-            Jogo.resumo_texto.isnot(None),
-            Jogo.resumo_texto.contains('x')
-        ).all()
-        
-        vitorias = 0
-        derrotas = 0
-        empates = 0
-        
-        for jogo in jogos:
-            if 'x' in jogo.resumo_texto and 'realizado' in jogo.resumo_texto:
-                try:
-                    # Extrair placar do texto "3 x 1 - realizado"
-                    placar_part = jogo.resumo_texto.split('x')
-                    if len(placar_part) >= 2:
-                        assoc_gols = int(placar_part[0].strip())
-                        adv_gols = int(placar_part[1].split()[0].strip())
-                        
-                        if assoc_gols > adv_gols:
-                            vitorias += 1
-                        elif assoc_gols < adv_gols:
-                            derrotas += 1
-                        else:
-                            empates += 1
-                except (ValueError, IndexError):
-                    continue
+        vitorias, derrotas, empates = db.session.query(
+            db.func.sum(db.case((Jogo.gols_pro > Jogo.gols_contra, 1), else_=0)),
+            db.func.sum(db.case((Jogo.gols_pro < Jogo.gols_contra, 1), else_=0)),
+            db.func.sum(db.case((Jogo.gols_pro == Jogo.gols_contra, 1), else_=0)),
+        ).filter(
+            Jogo.status == 'realizado',
+            Jogo.gols_pro.isnot(None),
+            Jogo.gols_contra.isnot(None)
+        ).one()
+        
+        vitorias = vitorias or 0
+        derrotas = derrotas or 0
+        empates = empates or 0
         
         total_jogos = vitorias + derrotas + empates
         aproveitamento = (vitorias * 3 + empates) / (total_jogos * 3) * 100 if total_jogos > 0 else 0
@@ -3046,9 +4845,6 @@ def debug_info():
 def whatsapp_grupo():
     """Página para criar mensagens para grupos do WhatsApp"""
     try:
-        # Forçar refresh do banco para garantir dados atualizados
-        forcar_refresh_banco()
-        
         # Buscar jogos para seleção
         jogos = Jogo.query.order_by(Jogo.data.desc()).all()
         
@@ -3178,6 +4974,17 @@ if __name__ == '__main__':
                 print("Adicionando coluna ano_referencia...")
                 db.session.execute(text('ALTER TABLE financeiro ADD COLUMN ano_referencia INTEGER'))
                 db.session.commit()
+            
+            if 'mes' not in financeiro_columns:
+                print("Adicionando coluna mes (execute migrate_mes_mensalidade.py para preencher)...")
+                db.session.execute(text('ALTER TABLE financeiro ADD COLUMN mes INTEGER'))
+                db.session.commit()
+            
+            if 'jogo_id' not in financeiro_columns:
+                print("Adicionando coluna jogo_id (execute migrate_financeiro_jogo.py para preencher)...")
+                db.session.execute(text('ALTER TABLE financeiro ADD COLUMN jogo_id INTEGER REFERENCES jogo(id)'))
+                db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_financeiro_jogo_id ON financeiro(jogo_id)'))
+                db.session.commit()
                 
             # Verificar colunas na tabela jogador
             jogador_columns = [col['name'] for col in inspector.get_columns('jogador')]
@@ -3199,6 +5006,13 @@ if __name__ == '__main__':
                 print("Adicionando coluna horario à tabela jogo...")
                 db.session.execute(text('ALTER TABLE jogo ADD COLUMN horario TIME DEFAULT "19:00:00"'))
                 db.session.commit()
+            
+            if 'gols_pro' not in jogo_columns:
+                print("Adicionando colunas de placar (execute migrate_placar_jogo.py para converter os antigos)...")
+                db.session.execute(text('ALTER TABLE jogo ADD COLUMN gols_pro INTEGER'))
+                db.session.execute(text('ALTER TABLE jogo ADD COLUMN gols_contra INTEGER'))
+                db.session.execute(text('ALTER TABLE jogo ADD COLUMN status VARCHAR(15)'))
+                db.session.commit()
                 
         except Exception as e:
             logger.warning(f"Aviso ao verificar colunas: {e}")
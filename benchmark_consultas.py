@@ -0,0 +1,95 @@
+"""
+Benchmark de consultas SQL por rota.
+
+Cria um banco SQLite temporário com dados de exemplo, faz login como admin e
+chama as rotas de leitura duas vezes: reproduzindo o comportamento antigo
+(expire_all() no início de cada rota e expire_on_commit ligado) e com o ciclo de
+sessão atual. A quantidade de consultas vem do cabeçalho Server-Timing.
+
+Uso: python benchmark_consultas.py [repeticoes]
+"""
+
+import os
+import re
+import sys
+import tempfile
+from datetime import date, timedelta
+from time import perf_counter
+
+pasta = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(pasta, 'benchmark.db')}"
+
+from app import app, db, Jogador, Jogo, Participacao, Financeiro
+from flask_login import current_user
+
+ROTAS = ['/', '/ranking', '/jogos', '/presencas/1', '/jogadores', '/financeiro', '/associados', '/whatsapp/grupo']
+PADRAO_CONSULTAS = re.compile(r'desc="(\d+) consultas"')
+
+modo_antigo = {'ativo': False}
+
+@app.before_request
+def _reproduzir_refresh_antigo():
+    # Antes: login_required carregava o usuário e a rota chamava forcar_refresh_banco()
+    if modo_antigo['ativo']:
+        db.session().expire_on_commit = True
+        if current_user.is_authenticated:
+            db.session.expire_all()
+
+def popular_banco():
+    """Dados de exemplo: 30 jogadores, 20 jogos, mensalidades e despesas"""
+    with app.app_context():
+        jogadores = [Jogador(nome=f'Jogador {i:02d}', tipo='SOCIO' if i % 3 else 'CONVIDADO') for i in range(30)]
+        db.session.add_all(jogadores)
+        db.session.flush()
+        for k in range(20):
+            jogo = Jogo(data=date.today() - timedelta(days=7 * k), adversario=f'Adversario {k}',
+                        local='Campo', craque_id=jogadores[k].id)
+            db.session.add(jogo)
+            db.session.flush()
+            for i, jogador in enumerate(jogadores[:22]):
+                pagou = (i + k) % 3 != 0
+                db.session.add(Participacao(jogo_id=jogo.id, jogador_id=jogador.id, confirmou=(i + k) % 4 != 0,
+                                            pagou=pagou, valor_pago=20 if pagou else 0, gols=(i * k) % 3))
+            db.session.add(Financeiro(data=jogo.data, tipo='DESPESA', descricao=f'Despesa Jogo {k}',
+                                      valor=150, jogo_id=jogo.id))
+        for mes in range(1, 13):
+            for jogador in jogadores:
+                if jogador.tipo == 'SOCIO':
+                    db.session.add(Financeiro(data=date(2025, mes, 5), tipo='MENSALIDADE', valor=50,
+                                              descricao=f'Mensalidade {mes:02d}/2025 - {jogador.nome}',
+                                              jogador_id=jogador.id, mes_referencia=f'{mes:02d}/2025',
+                                              ano_referencia=2025, mes=mes))
+        db.session.commit()
+
+def medir(cliente, repeticoes):
+    """{rota: (consultas, ms médios)}"""
+    resultado = {}
+    for rota in ROTAS:
+        consultas = 0
+        inicio = perf_counter()
+        for _ in range(repeticoes):
+            resposta = cliente.get(rota)
+            encontrado = PADRAO_CONSULTAS.search(resposta.headers.get('Server-Timing', ''))
+            consultas = int(encontrado.group(1)) if encontrado else -1
+        resultado[rota] = (consultas, (perf_counter() - inicio) * 1000 / repeticoes)
+    return resultado
+
+if __name__ == '__main__':
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    popular_banco()
+    app.logger.disabled = True
+
+    cliente = app.test_client()
+    cliente.post('/login/', data={'username': 'admin', 'password': '@admin1974'})
+
+    medir(cliente, 1)  # aquece templates e caches antes de medir
+
+    modo_antigo['ativo'] = True
+    antes = medir(cliente, repeticoes)
+    modo_antigo['ativo'] = False
+    depois = medir(cliente, repeticoes)
+
+    print(f"{'Rota':<18} {'Consultas antes':>16} {'Consultas agora':>16} {'ms antes':>10} {'ms agora':>10}")
+    print('-' * 74)
+    for rota in ROTAS:
+        print(f"{rota:<18} {antes[rota][0]:>16} {depois[rota][0]:>16} {antes[rota][1]:>10.1f} {depois[rota][1]:>10.1f}")
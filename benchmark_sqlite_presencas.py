@@ -0,0 +1,94 @@
+"""
+Benchmark de concorrência no SQLite: vários sócios se adicionando ao mesmo jogo
+ao mesmo tempo pelo POST de /presencas/<id> (acao=add_jogador).
+
+Roda o cenário duas vezes, cada uma num processo com banco novo: sem o perfil
+do SQLite (SQLITE_PERFIL=0, journal padrão) e com o perfil (WAL, busy_timeout
+etc.). Mostra quantas confirmações deram certo, quantas falharam (ex.: "database
+is locked") e o tempo por requisição.
+
+Uso: python benchmark_sqlite_presencas.py [socios] [rodadas]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import date
+from time import perf_counter
+
+def executar_cenario(quantidade_socios, rodadas):
+    """Executado no processo filho, com DATABASE_URL e SQLITE_PERFIL já definidos"""
+    from app import app, db, Jogador, Jogo, User, Participacao
+
+    with app.app_context():
+        for rodada in range(rodadas):
+            db.session.add(Jogo(data=date.today(), adversario=f'Rodada {rodada}', local='Campo'))
+        for i in range(quantidade_socios):
+            jogador = Jogador(nome=f'Socio {i:03d}', tipo='SOCIO')
+            db.session.add(jogador)
+            db.session.flush()
+            usuario = User(username=f'socio{i}', email=f'socio{i}@teste.com', role='visualizador', jogador_id=jogador.id)
+            usuario.set_password('senha123')
+            db.session.add(usuario)
+        db.session.commit()
+        jogos = [jogo.id for jogo in Jogo.query.order_by(Jogo.id)]
+        modo_journal = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+
+    clientes = []
+    for i in range(quantidade_socios):
+        cliente = app.test_client()
+        cliente.post('/login/', data={'username': f'socio{i}', 'password': 'senha123'})
+        clientes.append(cliente)
+
+    resultados = []
+    trava = threading.Lock()
+
+    def confirmar(cliente, jogo_id, barreira):
+        barreira.wait()
+        inicio = perf_counter()
+        resposta = cliente.post(f'/presencas/{jogo_id}', data={'acao': 'add_jogador'})
+        duracao = (perf_counter() - inicio) * 1000
+        with cliente.session_transaction() as sessao:
+            mensagens = sessao.pop('_flashes', [])
+        ok = resposta.status_code == 302 and any(categoria == 'success' for categoria, _ in mensagens)
+        with trava:
+            resultados.append((ok, duracao))
+
+    inicio_total = perf_counter()
+    for jogo_id in jogos:
+        barreira = threading.Barrier(quantidade_socios)
+        threads = [threading.Thread(target=confirmar, args=(cliente, jogo_id, barreira)) for cliente in clientes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    total_s = perf_counter() - inicio_total
+
+    with app.app_context():
+        gravadas = Participacao.query.count()
+
+    duracoes = sorted(duracao for _, duracao in resultados)
+    sucesso = sum(1 for ok, _ in resultados if ok)
+    print(f"journal_mode={modo_journal}: {sucesso}/{len(resultados)} confirmacoes OK, "
+          f"{len(resultados) - sucesso} falhas, {gravadas} gravadas | "
+          f"mediana {duracoes[len(duracoes) // 2]:.0f} ms, p95 {duracoes[int(len(duracoes) * 0.95) - 1]:.0f} ms, "
+          f"total {total_s:.1f} s")
+
+if __name__ == '__main__':
+    if os.environ.get('BENCHMARK_FILHO'):
+        executar_cenario(int(sys.argv[1]), int(sys.argv[2]))
+        sys.exit(0)
+
+    socios = sys.argv[1] if len(sys.argv) > 1 else '30'
+    rodadas = sys.argv[2] if len(sys.argv) > 2 else '3'
+    print(f"{socios} socios confirmando presenca ao mesmo tempo em {rodadas} jogo(s)")
+    print('-' * 70)
+    for perfil, nome in (('0', 'Sem perfil (padrao)'), ('1', 'Com perfil SQLite')):
+        pasta = tempfile.mkdtemp()
+        ambiente = dict(os.environ, BENCHMARK_FILHO='1', SQLITE_PERFIL=perfil, LOG_LEVEL='ERROR',
+                        DATABASE_URL=f"sqlite:///{os.path.join(pasta, 'benchmark.db')}")
+        ambiente.pop('DATABASE_READ_URL', None)
+        print(f"{nome}: ", end='', flush=True)
+        subprocess.run([sys.executable, os.path.abspath(__file__), socios, rodadas], env=ambiente, check=True)
@@ -0,0 +1,219 @@
+"""
+Cache da aplicação com invalidação por entidade (etiquetas)
+
+Cada valor é guardado junto com a versão das etiquetas de que depende
+('jogo', 'participacao', 'financeiro', 'jogador'). Invalidar uma etiqueta só
+incrementa a versão dela; na leitura, uma entrada com versão diferente da atual
+é descartada. Assim não é preciso saber quais chaves dependem de quê.
+
+O app pode trocar a origem das versões (fonte_versoes): com os contadores
+gravados no banco na mesma transação dos dados, todos os processos enxergam a
+mesma versão no mesmo instante, inclusive com o backend local. Etiquetas em
+etiquetas_do_backend continuam nos contadores do backend, sem consultar a
+fonte: servem para entradas lidas em toda requisição (o usuário logado), que
+assim não custam uma ida ao banco.
+
+Backends:
+- CacheLocal: LRU + TTL em memória, por processo (padrão). Sem fonte_versoes,
+  com vários workers do Gunicorn a invalidação só vale no processo que gravou;
+  os outros ficam limitados pelo TTL.
+- CacheRedis: compartilhado entre processos (Redis ou compatível). Usado quando
+  CACHE_REDIS_URL está definida; o pacote redis só é importado nesse caso.
+"""
+
+import logging
+import pickle
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+logger = logging.getLogger(__name__)
+
+AUSENTE = object()
+
+class CacheLocal:
+    """LRU com TTL em memória, seguro para várias threads"""
+
+    nome = 'local'
+
+    def __init__(self, max_itens=512):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()  # chave -> (expira_em, entrada)
+        self._versoes = {}
+        self._trava = threading.Lock()
+
+    def ler(self, chave, etiquetas):
+        """(entrada ou AUSENTE, versões atuais das etiquetas)"""
+        with self._trava:
+            versoes = tuple(self._versoes.get(etiqueta, 0) for etiqueta in etiquetas)
+            item = self._itens.get(chave)
+            if item is None:
+                return AUSENTE, versoes
+            if item[0] <= monotonic():
+                del self._itens[chave]
+                return AUSENTE, versoes
+            self._itens.move_to_end(chave)
+            return item[1], versoes
+
+    def gravar(self, chave, entrada, ttl):
+        with self._trava:
+            self._itens[chave] = (monotonic() + ttl, entrada)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def incrementar(self, etiquetas):
+        with self._trava:
+            for etiqueta in etiquetas:
+                self._versoes[etiqueta] = self._versoes.get(etiqueta, 0) + 1
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+class CacheRedis:
+    """Cache compartilhado: valores em pickle com SETEX e versões em contadores INCR"""
+
+    nome = 'redis'
+
+    def __init__(self, cliente, prefixo='associacao:'):
+        self.cliente = cliente
+        self.prefixo = prefixo
+
+    @classmethod
+    def da_url(cls, url, prefixo='associacao:'):
+        import redis
+        return cls(redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5), prefixo)
+
+    def _chave(self, chave):
+        return f'{self.prefixo}c:{chave}'
+
+    def _versao(self, etiqueta):
+        return f'{self.prefixo}v:{etiqueta}'
+
+    def ler(self, chave, etiquetas):
+        # Entrada e versões em uma única ida ao servidor
+        valores = self.cliente.mget([self._chave(chave)] + [self._versao(e) for e in etiquetas])
+        versoes = tuple(int(v) if v is not None else 0 for v in valores[1:])
+        if valores[0] is None:
+            return AUSENTE, versoes
+        return pickle.loads(valores[0]), versoes
+
+    def gravar(self, chave, entrada, ttl):
+        self.cliente.set(self._chave(chave), pickle.dumps(entrada, pickle.HIGHEST_PROTOCOL), ex=max(int(ttl), 1))
+
+    def incrementar(self, etiquetas):
+        pipe = self.cliente.pipeline(transaction=False)
+        for etiqueta in etiquetas:
+            pipe.incr(self._versao(etiqueta))
+        pipe.execute()
+
+    def limpar(self):
+        chaves = list(self.cliente.scan_iter(match=f'{self.prefixo}c:*', count=500))
+        if chaves:
+            self.cliente.delete(*chaves)
+
+    def __len__(self):
+        return sum(1 for _ in self.cliente.scan_iter(match=f'{self.prefixo}c:*', count=500))
+
+class Cache:
+    """Fachada usada pelo app: obter(chave, calcular, etiquetas) e invalidar(*etiquetas)
+
+    Falhas do backend (ex.: Redis fora do ar) não derrubam a requisição: o valor
+    é calculado direto do banco e o erro vai para o log.
+
+    fonte_versoes(etiquetas) -> tupla de versões (ou None se indisponível)
+    substitui os contadores do backend; aí invalidar() só incrementa as
+    etiquetas_do_backend, pois quem grava já incrementa a fonte.
+    """
+
+    def __init__(self, backend, ttl_padrao=300, fonte_versoes=None, etiquetas_do_backend=()):
+        self.backend = backend
+        self.ttl_padrao = ttl_padrao
+        self.fonte_versoes = fonte_versoes
+        self.etiquetas_do_backend = frozenset(etiquetas_do_backend)
+        self.acertos = 0
+        self.faltas = 0
+        self.erros = 0
+
+    def obter(self, chave, calcular, etiquetas=(), ttl=None):
+        etiquetas = tuple(sorted(etiquetas))
+        try:
+            if self.fonte_versoes:
+                da_fonte = tuple(e for e in etiquetas if e not in self.etiquetas_do_backend)
+                versoes_fonte = self.fonte_versoes(da_fonte) if da_fonte else ()
+                if versoes_fonte is None:
+                    return calcular()
+                do_backend = tuple(e for e in etiquetas if e in self.etiquetas_do_backend)
+                entrada, versoes = self.backend.ler(chave, do_backend)
+                versoes += versoes_fonte
+            else:
+                entrada, versoes = self.backend.ler(chave, etiquetas)
+        except Exception as e:
+            self.erros += 1
+            logger.warning(f"Cache indisponível ({self.backend.nome}), lendo do banco: {e}")
+            return calcular()
+
+        if entrada is not AUSENTE and entrada[0] == versoes:
+            self.acertos += 1
+            return entrada[1]
+
+        # Grava com as versões lidas ANTES do cálculo: se algo for invalidado
+        # enquanto calcula, a entrada já nasce vencida
+        self.faltas += 1
+        valor = calcular()
+        if valor is not None:
+            try:
+                self.backend.gravar(chave, (versoes, valor), ttl or self.ttl_padrao)
+            except Exception as e:
+                self.erros += 1
+                logger.warning(f"Falha ao gravar no cache ({self.backend.nome}): {e}")
+        return valor
+
+    def invalidar(self, *etiquetas):
+        if self.fonte_versoes:
+            etiquetas = [e for e in etiquetas if e in self.etiquetas_do_backend]
+        if not etiquetas:
+            return
+        try:
+            self.backend.incrementar(sorted(set(etiquetas)))
+        except Exception as e:
+            self.erros += 1
+            logger.error(f"Falha ao invalidar o cache ({self.backend.nome}) para {etiquetas}: {e}")
+
+    def limpar(self):
+        try:
+            self.backend.limpar()
+        except Exception as e:
+            self.erros += 1
+            logger.error(f"Falha ao limpar o cache ({self.backend.nome}): {e}")
+
+    def estatisticas(self):
+        total = self.acertos + self.faltas
+        try:
+            itens = len(self.backend)
+        except Exception:
+            itens = None
+        return {
+            'backend': self.backend.nome,
+            'itens': itens,
+            'acertos': self.acertos,
+            'faltas': self.faltas,
+            'erros': self.erros,
+            'taxa_acerto': (self.acertos / total * 100) if total else 0.0,
+        }
+
+def criar_cache(url_redis=None, ttl=300, max_itens=512, prefixo='associacao:'):
+    """Cache compartilhado (Redis) se houver URL, senão o LRU local"""
+    if url_redis:
+        try:
+            backend = CacheRedis.da_url(url_redis, prefixo)
+            backend.cliente.ping()
+            logger.info(f"Cache compartilhado em {url_redis.split('@')[-1]}")
+            return Cache(backend, ttl)
+        except Exception as e:
+            logger.error(f"Redis indisponível ({e}); usando cache local em memória")
+    return Cache(CacheLocal(max_itens), ttl)
@@ -3,13 +3,89 @@ Arquivo de configuração para o sistema de gestão da associação
 """
 
 import os
+import shlex
 from datetime import timedelta
 
+def normalizar_url_banco(url):
+    """Remove espaços e corrige o padrão antigo do Render (postgres://)"""
+    url = (url or '').strip()
+    if url.startswith('postgres://'):
+        url = url.replace('postgres://', 'postgresql://', 1)
+    return url
+
+def _env_int(nome, padrao):
+    valor = os.environ.get(nome, '').strip()
+    return int(valor) if valor else padrao
+
+def _env_bool(nome, padrao):
+    valor = os.environ.get(nome, '').strip().lower()
+    return padrao if not valor else valor in ('1', 'true', 'sim', 'yes', 'on')
+
+def gunicorn_workers_threads():
+    """(workers, threads) do Gunicorn: --workers/--threads em GUNICORN_CMD_ARGS,
+    ou WEB_CONCURRENCY / GUNICORN_THREADS; sem Gunicorn, (1, 1)"""
+    workers = _env_int('WEB_CONCURRENCY', 1)
+    threads = _env_int('GUNICORN_THREADS', 1)
+    argumentos = shlex.split(os.environ.get('GUNICORN_CMD_ARGS', ''))
+    for i, argumento in enumerate(argumentos):
+        nome, _, valor = argumento.partition('=')
+        if not valor and i + 1 < len(argumentos):
+            valor = argumentos[i + 1]
+        if nome in ('-w', '--workers') and valor.isdigit():
+            workers = int(valor)
+        elif nome == '--threads' and valor.isdigit():
+            threads = int(valor)
+    return max(workers, 1), max(threads, 1)
+
+def opcoes_engine(url):
+    """SQLALCHEMY_ENGINE_OPTIONS a partir do ambiente.
+
+    O pool é por processo: cada worker do Gunicorn atende até `threads` requisições
+    ao mesmo tempo, então pool_size = threads e uma folga de max_overflow. O total
+    de conexões no banco fica em workers x (pool_size + max_overflow).
+    """
+    _, threads = gunicorn_workers_threads()
+    opcoes = {
+        # Testa a conexão antes de usar: o Postgres gerenciado derruba conexões ociosas
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 300),
+    }
+    if url.startswith('sqlite') and ':memory:' in url:
+        return opcoes
+
+    opcoes['pool_size'] = _env_int('DB_POOL_SIZE', threads)
+    opcoes['max_overflow'] = _env_int('DB_MAX_OVERFLOW', max(2, threads // 2))
+    opcoes['pool_timeout'] = _env_int('DB_POOL_TIMEOUT', 30)
+
+    statement_timeout = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+    if url.startswith('postgresql') and statement_timeout:
+        opcoes['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return opcoes
+
 class Config:
     """Configuração base"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///associacao.db'
+    SQLALCHEMY_DATABASE_URI = normalizar_url_banco(os.environ.get('DATABASE_URL')) or 'sqlite:///local.db'
+    SQLALCHEMY_ENGINE_OPTIONS = opcoes_engine(SQLALCHEMY_DATABASE_URI)
+    
+    # Réplica de leitura opcional (ver RÉPLICA DE LEITURA em app.py)
+    DATABASE_READ_URL = normalizar_url_banco(os.environ.get('DATABASE_READ_URL'))
+    # A réplica tem o próprio pool, com as mesmas regras (pre_ping, recycle, tamanho por threads)
+    SQLALCHEMY_BINDS = (
+        {'replica': {'url': DATABASE_READ_URL, **opcoes_engine(DATABASE_READ_URL)}} if DATABASE_READ_URL else {}
+    )
+    
+    # Cache da aplicação (ver cache.py): Redis compartilhado se houver URL, senão LRU local
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', '').strip()
+    CACHE_TTL = _env_int('CACHE_TTL', 300)
+    CACHE_MAX_ITENS = _env_int('CACHE_MAX_ITENS', 512)
+    CACHE_PREFIXO = os.environ.get('CACHE_PREFIXO', 'associacao:')
+
+    # PDFs gerados guardados em disco (ver CACHE DE PDFs em app.py); PDF_CACHE_MAX_MB=0 desliga
+    PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR', '').strip()
+    PDF_CACHE_MAX_MB = _env_int('PDF_CACHE_MAX_MB', 50)
+    PDF_CACHE_MAX_DIAS = _env_int('PDF_CACHE_MAX_DIAS', 7)
     
     # Configurações de sessão
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
@@ -20,6 +96,10 @@ class Config:
     # Configurações de upload (se necessário no futuro)
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
 
+    @staticmethod
+    def init_app(app):
+        pass
+
 class DevelopmentConfig(Config):
     """Configuração para desenvolvimento"""
     DEBUG = True
@@ -29,15 +109,16 @@ class ProductionConfig(Config):
     """Configuração para produção"""
     DEBUG = False
     SQLALCHEMY_ECHO = False
-    
-    # Em produção, use variáveis de ambiente
-    SECRET_KEY = os.environ.get('SECRET_KEY')
-    if not SECRET_KEY:
-        raise ValueError("SECRET_KEY não definida. Configure a variável de ambiente.")
 
-# Configuração padrão
+    @staticmethod
+    def init_app(app):
+        # Em produção, use variáveis de ambiente
+        if not os.environ.get('SECRET_KEY'):
+            raise ValueError("SECRET_KEY não definida. Configure a variável de ambiente.")
+
+# Configuração usada pelo app: APP_CONFIG=development|production (padrão: base)
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
-    'default': DevelopmentConfig
+    'default': Config
 }
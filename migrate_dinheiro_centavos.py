@@ -0,0 +1,84 @@
+"""
+Script de migração dos valores monetários de float para centavos (inteiro):
+financeiro.valor, participacao.valor_pago e jogo.valor_jogo passam a ser BIGINT
+com o valor multiplicado por 100 e arredondado. As tabelas derivadas
+(estatistica_jogador, saldo_diario e mensalidade_socio) são recriadas e
+recalculadas em seguida: ao importar o app, o backfill da inicialização pode
+ter preenchido mensalidade_socio ainda com os valores antigos (50.0 lido como
+50 centavos).
+Faça backup do banco antes e execute este script uma vez
+"""
+
+from app import (app, db, EstatisticaJogador, SaldoDiario, MensalidadeSocio, recalcular_estatisticas_jogadores,
+                 recalcular_saldos_diarios, recalcular_matriz_mensalidades)
+from sqlalchemy import text
+
+COLUNAS_MONETARIAS = [
+    ('financeiro', 'valor'),
+    ('participacao', 'valor_pago'),
+    ('jogo', 'valor_jogo'),
+]
+
+def coluna_em_centavos(inspector, tabela, coluna):
+    for col in inspector.get_columns(tabela):
+        if col['name'] == coluna:
+            return 'INT' in str(col['type']).upper()
+    return None
+
+def converter_coluna(tabela, coluna):
+    """Converte a coluna REAL/FLOAT em BIGINT de centavos"""
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text(
+            f'ALTER TABLE {tabela} ALTER COLUMN {coluna} TYPE BIGINT '
+            f'USING ROUND({coluna} * 100)::BIGINT'
+        ))
+    else:
+        # SQLite não altera tipo de coluna: cria a nova, copia e troca (SQLite >= 3.35)
+        temporaria = f'{coluna}_centavos'
+        db.session.execute(text(f'ALTER TABLE {tabela} ADD COLUMN {temporaria} BIGINT'))
+        db.session.execute(text(f'UPDATE {tabela} SET {temporaria} = CAST(ROUND({coluna} * 100) AS INTEGER)'))
+        db.session.execute(text(f'ALTER TABLE {tabela} DROP COLUMN {coluna}'))
+        db.session.execute(text(f'ALTER TABLE {tabela} RENAME COLUMN {temporaria} TO {coluna}'))
+    db.session.commit()
+
+def migrate_database():
+    """Converte as colunas monetárias e recalcula as tabelas derivadas"""
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+
+            for tabela, coluna in COLUNAS_MONETARIAS:
+                situacao = coluna_em_centavos(inspector, tabela, coluna)
+                if situacao is None:
+                    print(f"[AVISO] Coluna {tabela}.{coluna} nao encontrada")
+                elif situacao:
+                    print(f"[INFO] Coluna {tabela}.{coluna} ja esta em centavos")
+                else:
+                    print(f"Convertendo {tabela}.{coluna} para centavos...")
+                    converter_coluna(tabela, coluna)
+                    print(f"[OK] Coluna {tabela}.{coluna} convertida")
+
+            # Tabelas derivadas: recriadas com o novo tipo e recalculadas do histórico
+            for modelo in (EstatisticaJogador, SaldoDiario, MensalidadeSocio):
+                modelo.__table__.drop(db.engine, checkfirst=True)
+                modelo.__table__.create(db.engine)
+            total = recalcular_estatisticas_jogadores()
+            print(f"[OK] Estatisticas recalculadas para {total} jogadores")
+            total = recalcular_saldos_diarios()
+            print(f"[OK] Saldo diario recalculado para {total} dias")
+            total = recalcular_matriz_mensalidades()
+            print(f"[OK] Matriz de mensalidades recalculada: {total} competencias")
+
+            print("\n[OK] Migracao concluida com sucesso!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERRO] Erro na migracao: {e}")
+            raise
+
+if __name__ == '__main__':
+    print("Iniciando migracao do banco de dados...")
+    print("=" * 50)
+    migrate_database()
+    print("=" * 50)
+    print("Processo concluido!")
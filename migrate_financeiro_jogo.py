@@ -0,0 +1,104 @@
+"""
+Script de migração para adicionar a coluna jogo_id ao modelo Financeiro
+e preenchê-la a partir das descrições geradas em presencas():
+    "Despesa Jogo dd/mm/aaaa: ..."  e  "Pgto Jogo dd/mm/aaaa - Nome"
+Execute este script uma vez para atualizar o banco de dados existente
+"""
+
+import re
+from datetime import datetime
+
+from app import app, db, Financeiro, Jogo, Jogador, Participacao
+from sqlalchemy import text
+
+PADRAO_DESCRICAO = re.compile(r'^(Despesa|Pgto) Jogo (\d{2}/\d{2}/\d{4})(?:: | - )?(.*)$')
+
+def identificar_jogo(descricao, jogos_por_data):
+    """Retorna o id do jogo citado na descrição, ou None se não der para saber"""
+    encontrado = PADRAO_DESCRICAO.match(descricao or '')
+    if not encontrado:
+        return None
+    origem, data_str, resto = encontrado.groups()
+    try:
+        data_jogo = datetime.strptime(data_str, '%d/%m/%Y').date()
+    except ValueError:
+        return None
+
+    candidatos = jogos_por_data.get(data_jogo, [])
+    if len(candidatos) == 1:
+        return candidatos[0]
+    if len(candidatos) > 1 and origem == 'Pgto':
+        # Dois jogos na mesma data: usa o jogo em que o jogador teve o pagamento lançado
+        ids = [jogo_id for (jogo_id,) in db.session.query(Participacao.jogo_id).join(Jogador).filter(
+            Participacao.jogo_id.in_(candidatos),
+            Participacao.lancado_financeiro.is_(True),
+            Jogador.nome == resto.strip()
+        ).all()]
+        if len(ids) == 1:
+            return ids[0]
+    return None
+
+def migrate_database():
+    """Adiciona jogo_id e preenche os registros existentes"""
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('financeiro')]
+
+            if 'jogo_id' not in columns:
+                print("Adicionando coluna jogo_id...")
+                db.session.execute(text('ALTER TABLE financeiro ADD COLUMN jogo_id INTEGER REFERENCES jogo(id)'))
+                db.session.commit()
+                print("[OK] Coluna jogo_id adicionada")
+            else:
+                print("[INFO] Coluna jogo_id ja existe")
+
+            db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_financeiro_jogo_id ON financeiro(jogo_id)'))
+            db.session.commit()
+            print("[OK] Indice ix_financeiro_jogo_id criado")
+
+            jogos_por_data = {}
+            for jogo_id, data_jogo in db.session.query(Jogo.id, Jogo.data).all():
+                jogos_por_data.setdefault(data_jogo, []).append(jogo_id)
+
+            pendentes = db.session.query(Financeiro.id, Financeiro.descricao).filter(
+                Financeiro.jogo_id.is_(None),
+                Financeiro.tipo.in_(['DESPESA', 'PARTIDA']),
+                db.or_(Financeiro.descricao.like('Despesa Jogo %'), Financeiro.descricao.like('Pgto Jogo %'))
+            ).all()
+
+            atualizacoes = []
+            sem_jogo = []
+            for mov_id, descricao in pendentes:
+                jogo_id = identificar_jogo(descricao, jogos_por_data)
+                if jogo_id:
+                    atualizacoes.append({'mov_id': mov_id, 'jogo_id': jogo_id})
+                else:
+                    sem_jogo.append((mov_id, descricao))
+
+            if atualizacoes:
+                db.session.execute(
+                    text('UPDATE financeiro SET jogo_id = :jogo_id WHERE id = :mov_id'),
+                    atualizacoes
+                )
+                db.session.commit()
+            print(f"[OK] {len(atualizacoes)} movimentacoes vinculadas ao jogo")
+
+            if sem_jogo:
+                print(f"[AVISO] {len(sem_jogo)} movimentacoes sem jogo identificavel (ficam com jogo_id vazio):")
+                for mov_id, descricao in sem_jogo:
+                    print(f"        #{mov_id}: {descricao}")
+
+            print("\n[OK] Migracao concluida com sucesso!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERRO] Erro na migracao: {e}")
+            raise
+
+if __name__ == '__main__':
+    print("Iniciando migracao do banco de dados...")
+    print("=" * 50)
+    migrate_database()
+    print("=" * 50)
+    print("Processo concluido!")
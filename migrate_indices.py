@@ -0,0 +1,123 @@
+"""
+Script de migração (pode ser executado quantas vezes precisar) que cria os
+índices compostos e parciais das consultas mais usadas e confere, com EXPLAIN,
+se o banco realmente os usa:
+
+    ix_financeiro_tipo_data        financeiro (tipo, data, id)       extrato, totais por tipo/período
+                                                                     e todas_despesas em presencas()
+    ix_participacao_jogador_pagou  participacao (jogador_id, pagou)  ranking financeiro / recálculo
+    ix_jogo_craque_id              jogo (craque_id)                  ranking técnico (craque do jogo)
+
+Um índice parcial (data) WHERE tipo = 'DESPESA' não foi criado: o composto
+(tipo, data, id) já entrega as despesas na ordem de data, sem ordenação extra.
+
+Funciona em PostgreSQL e SQLite. Use "python migrate_indices.py --verificar"
+para rodar apenas o EXPLAIN.
+"""
+
+import sys
+from datetime import date
+
+from app import app, db, Financeiro, Participacao, Jogo
+from sqlalchemy import select, func
+
+INDICES = [
+    ('financeiro', 'ix_financeiro_tipo_data'),
+    ('participacao', 'ix_participacao_jogador_pagou'),
+    ('jogo', 'ix_jogo_craque_id'),
+]
+
+# (descrição, índice esperado, consulta) - as mesmas condições usadas nas rotas.
+# Nas consultas com ORDER BY também se confere que o banco não ordena à parte.
+CONSULTAS_QUENTES = [
+    ('Extrato filtrado por tipo (/financeiro?tipo=...)', 'ix_financeiro_tipo_data',
+     select(Financeiro).where(Financeiro.tipo == 'MENSALIDADE')
+     .order_by(Financeiro.data.desc(), Financeiro.id.desc()).limit(50)),
+    ('Total de um tipo no período (dashboard / PDF do caixa)', 'ix_financeiro_tipo_data',
+     select(func.count(Financeiro.id)).where(
+         Financeiro.tipo == 'PARTIDA', Financeiro.data.between(date(2024, 1, 1), date(2024, 12, 31)))),
+    ('Todas as despesas por data (presencas)', 'ix_financeiro_tipo_data',
+     select(Financeiro).where(Financeiro.tipo == 'DESPESA').order_by(Financeiro.data.desc())),
+    ('Pagamentos de um jogador (ranking financeiro)', 'ix_participacao_jogador_pagou',
+     select(func.count(Participacao.id)).where(Participacao.jogador_id == 1, Participacao.pagou.is_(True))),
+    ('Vezes que o jogador foi craque (ranking técnico)', 'ix_jogo_craque_id',
+     select(func.count(Jogo.id)).where(Jogo.craque_id == 1)),
+]
+
+# Como cada banco indica uma ordenação fora do índice no plano
+ORDENACAO_NO_PLANO = {'sqlite': 'TEMP B-TREE', 'postgresql': 'Sort'}
+
+def buscar_indice(nome_tabela, nome_indice):
+    tabela = db.metadata.tables[nome_tabela]
+    return next(indice for indice in tabela.indexes if indice.name == nome_indice)
+
+def plano_de_execucao(conexao, consulta):
+    """Texto do plano de execução da consulta no banco atual"""
+    compilada = consulta.compile(conexao)
+    if compilada.positional:
+        parametros = tuple(compilada.params[nome] for nome in compilada.positiontup)
+    else:
+        parametros = compilada.params
+
+    if conexao.dialect.name == 'postgresql':
+        # Tabelas pequenas levariam a seq scan; aqui interessa saber se o índice é utilizável
+        conexao.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        linhas = conexao.exec_driver_sql('EXPLAIN ' + str(compilada), parametros).all()
+        return '\n'.join(linha[0] for linha in linhas)
+
+    linhas = conexao.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compilada), parametros).all()
+    return '\n'.join(linha[-1] for linha in linhas)
+
+def verificar_indices():
+    """Roda EXPLAIN nas consultas quentes; retorna True se todas usam o índice esperado"""
+    todas_ok = True
+    with db.engine.connect() as conexao:
+        for descricao, indice, consulta in CONSULTAS_QUENTES:
+            with conexao.begin():
+                plano = plano_de_execucao(conexao, consulta)
+            ordenacao = ORDENACAO_NO_PLANO.get(conexao.dialect.name)
+            ordena_a_parte = 'ORDER BY' in str(consulta) and ordenacao and ordenacao in plano
+            if indice in plano and not ordena_a_parte:
+                print(f"[OK] {descricao}: usa {indice}")
+            else:
+                todas_ok = False
+                motivo = 'ordena fora do indice' if indice in plano else f'NAO usa {indice}'
+                print(f"[AVISO] {descricao}: {motivo}")
+                for linha in plano.splitlines():
+                    print(f"        {linha}")
+    return todas_ok
+
+def migrate_database():
+    """Cria os índices que faltam e confere os planos de execução"""
+    with app.app_context():
+        try:
+            for nome_tabela, nome_indice in INDICES:
+                # checkfirst: só cria se não existir (repetível)
+                buscar_indice(nome_tabela, nome_indice).create(db.engine, checkfirst=True)
+                print(f"[OK] Indice {nome_indice} criado/verificado")
+
+            # Atualiza as estatísticas do otimizador para ele considerar os índices novos
+            with db.engine.begin() as conexao:
+                conexao.exec_driver_sql('ANALYZE')
+            print("[OK] Estatisticas do otimizador atualizadas (ANALYZE)")
+
+            print("\nConferindo planos de execucao...")
+            if verificar_indices():
+                print("\n[OK] Migracao concluida com sucesso!")
+            else:
+                print("\n[AVISO] Indices criados, mas alguma consulta nao os usa (veja acima)")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERRO] Erro na migracao: {e}")
+            raise
+
+if __name__ == '__main__':
+    if '--verificar' in sys.argv:
+        with app.app_context():
+            sys.exit(0 if verificar_indices() else 1)
+    print("Iniciando migracao do banco de dados...")
+    print("=" * 50)
+    migrate_database()
+    print("=" * 50)
+    print("Processo concluido!")
@@ -0,0 +1,102 @@
+"""
+Script de migração para adicionar a coluna mes (1-12) ao modelo Financeiro,
+preenchê-la a partir de mes_referencia ("01/2024" ou "Janeiro/2024") e criar
+o índice único uq_financeiro_mensalidade (jogador_id, ano_referencia, mes)
+para as linhas com tipo = 'MENSALIDADE'
+Execute este script uma vez para atualizar o banco de dados existente
+"""
+
+from app import app, db, Financeiro, validar_mes
+from sqlalchemy import text, func
+
+def extrair_mes_ano(mes_referencia):
+    """Retorna (mes, ano) de "01/2024" ou "Janeiro/2024", ou (None, None)"""
+    partes = (mes_referencia or '').split('/')
+    try:
+        mes = validar_mes(partes[0])
+    except ValueError:
+        return None, None
+    ano = int(partes[1]) if len(partes) > 1 and partes[1].strip().isdigit() else None
+    return mes, ano
+
+def migrate_database():
+    """Adiciona mes, normaliza os registros existentes e cria o índice único"""
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('financeiro')]
+
+            if 'mes' not in columns:
+                print("Adicionando coluna mes...")
+                db.session.execute(text('ALTER TABLE financeiro ADD COLUMN mes INTEGER'))
+                db.session.commit()
+                print("[OK] Coluna mes adicionada")
+            else:
+                print("[INFO] Coluna mes ja existe")
+
+            pendentes = db.session.query(
+                Financeiro.id, Financeiro.mes_referencia, Financeiro.ano_referencia
+            ).filter(
+                Financeiro.tipo == 'MENSALIDADE',
+                Financeiro.mes.is_(None)
+            ).all()
+
+            atualizacoes = []
+            sem_mes = []
+            for mov_id, mes_referencia, ano_referencia in pendentes:
+                mes, ano = extrair_mes_ano(mes_referencia)
+                if mes:
+                    atualizacoes.append({'mov_id': mov_id, 'mes': mes, 'ano': ano_referencia or ano})
+                else:
+                    sem_mes.append((mov_id, mes_referencia))
+
+            if atualizacoes:
+                db.session.execute(
+                    text('UPDATE financeiro SET mes = :mes, ano_referencia = :ano WHERE id = :mov_id'),
+                    atualizacoes
+                )
+                db.session.commit()
+            print(f"[OK] {len(atualizacoes)} mensalidades normalizadas")
+
+            if sem_mes:
+                print(f"[AVISO] {len(sem_mes)} mensalidades com mes_referencia nao reconhecido (ficam com mes vazio):")
+                for mov_id, mes_referencia in sem_mes:
+                    print(f"        #{mov_id}: {mes_referencia}")
+
+            # O índice único só pode ser criado se não houver lançamentos em duplicidade
+            duplicadas = db.session.query(
+                Financeiro.jogador_id, Financeiro.ano_referencia, Financeiro.mes, func.count(Financeiro.id)
+            ).filter(
+                Financeiro.tipo == 'MENSALIDADE',
+                Financeiro.mes.isnot(None)
+            ).group_by(
+                Financeiro.jogador_id, Financeiro.ano_referencia, Financeiro.mes
+            ).having(func.count(Financeiro.id) > 1).all()
+
+            if duplicadas:
+                print(f"[AVISO] {len(duplicadas)} mensalidades lancadas mais de uma vez; extorne as duplicadas e rode novamente:")
+                for jogador_id, ano, mes, quantidade in duplicadas:
+                    print(f"        jogador {jogador_id} - {mes:02d}/{ano}: {quantidade} lancamentos")
+                print("[AVISO] Indice uq_financeiro_mensalidade NAO criado")
+            else:
+                db.session.execute(text(
+                    'CREATE UNIQUE INDEX IF NOT EXISTS uq_financeiro_mensalidade '
+                    'ON financeiro (jogador_id, ano_referencia, mes) '
+                    "WHERE tipo = 'MENSALIDADE'"
+                ))
+                db.session.commit()
+                print("[OK] Indice uq_financeiro_mensalidade criado")
+
+            print("\n[OK] Migracao concluida com sucesso!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERRO] Erro na migracao: {e}")
+            raise
+
+if __name__ == '__main__':
+    print("Iniciando migracao do banco de dados...")
+    print("=" * 50)
+    migrate_database()
+    print("=" * 50)
+    print("Processo concluido!")
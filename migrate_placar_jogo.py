@@ -0,0 +1,79 @@
+"""
+Script de migração para adicionar as colunas de placar ao modelo Jogo
+(gols_pro, gols_contra, status) e converter os placares antigos, que eram
+gravados como texto "3 x 1 - realizado" em resumo_texto.
+Execute este script uma vez para atualizar o banco de dados existente
+"""
+
+import re
+
+from app import app, db, Jogo
+from sqlalchemy import text
+
+PADRAO_PLACAR = re.compile(r'^\s*(\d+)\s*x\s*(\d+)\s*-\s*(realizado|cancelado|adiado)\s*$', re.IGNORECASE)
+
+def migrate_database():
+    """Adiciona as colunas de placar e converte os registros existentes"""
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('jogo')]
+
+            novas_colunas = [
+                ('gols_pro', 'INTEGER'),
+                ('gols_contra', 'INTEGER'),
+                ('status', 'VARCHAR(15)'),
+            ]
+            for nome, tipo in novas_colunas:
+                if nome not in columns:
+                    print(f"Adicionando coluna {nome}...")
+                    db.session.execute(text(f'ALTER TABLE jogo ADD COLUMN {nome} {tipo}'))
+                    db.session.commit()
+                    print(f"[OK] Coluna {nome} adicionada")
+                else:
+                    print(f"[INFO] Coluna {nome} ja existe")
+
+            db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_jogo_status ON jogo(status)'))
+            db.session.commit()
+            print("[OK] Indice ix_jogo_status criado")
+
+            # Converte "3 x 1 - realizado" para as colunas e libera resumo_texto
+            # para o resumo técnico (só quando o texto é exatamente um placar)
+            candidatos = db.session.query(Jogo.id, Jogo.resumo_texto).filter(
+                Jogo.gols_pro.is_(None),
+                Jogo.resumo_texto.isnot(None)
+            ).all()
+
+            atualizacoes = []
+            for jogo_id, resumo in candidatos:
+                encontrado = PADRAO_PLACAR.match(resumo)
+                if encontrado:
+                    gols_pro, gols_contra, status = encontrado.groups()
+                    atualizacoes.append({
+                        'jogo_id': jogo_id,
+                        'gols_pro': int(gols_pro),
+                        'gols_contra': int(gols_contra),
+                        'status': status.lower()
+                    })
+
+            if atualizacoes:
+                db.session.execute(text(
+                    'UPDATE jogo SET gols_pro = :gols_pro, gols_contra = :gols_contra, '
+                    'status = :status, resumo_texto = NULL WHERE id = :jogo_id'
+                ), atualizacoes)
+                db.session.commit()
+            print(f"[OK] {len(atualizacoes)} placares convertidos")
+
+            print("\n[OK] Migracao concluida com sucesso!")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ERRO] Erro na migracao: {e}")
+            raise
+
+if __name__ == '__main__':
+    print("Iniciando migracao do banco de dados...")
+    print("=" * 50)
+    migrate_database()
+    print("=" * 50)
+    print("Processo concluido!")
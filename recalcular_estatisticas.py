@@ -0,0 +1,19 @@
+"""
+Script para reconstruir as tabelas derivadas (estatistica_jogador, saldo_diario e
+mensalidade_socio) a partir do histórico. Use após importações manuais ou se
+suspeitar de divergência nos rankings, no extrato ou na lista de inadimplentes.
+"""
+
+from app import app, recalcular_estatisticas_jogadores, recalcular_saldos_diarios, recalcular_matriz_mensalidades
+
+if __name__ == '__main__':
+    print("Recalculando tabelas derivadas...")
+    print("=" * 50)
+    with app.app_context():
+        total = recalcular_estatisticas_jogadores()
+        print(f"[OK] Estatisticas recalculadas para {total} jogadores")
+        total = recalcular_saldos_diarios()
+        print(f"[OK] Saldo diario recalculado para {total} dias")
+        total = recalcular_matriz_mensalidades()
+        print(f"[OK] Matriz de mensalidades recalculada com {total} competencias")
+    print("=" * 50)
@@ -1,4 +1,4 @@
-const CACHE_NAME = "associacao-v3";
+const CACHE_NAME = "associacao-v4";
 
 const STATIC_ASSETS = [
   "/static/manifest.json",
@@ -30,8 +30,15 @@ self.addEventListener("fetch", event => {
   // Só trata GET
   if (event.request.method !== "GET") return;
 
+  // Páginas: sempre revalida com o servidor. O navegador manda o ETag guardado
+  // (If-None-Match) e, se os dados não mudaram, recebe um 304 sem corpo e
+  // reaproveita a cópia do cache HTTP.
+  const requisicao = event.request.mode === "navigate"
+    ? new Request(event.request, { cache: "no-cache" })
+    : event.request;
+
   event.respondWith(
-    fetch(event.request)
+    fetch(requisicao)
       .then(response => {
         // Salva assets estáticos
         if (event.request.url.includes("/static/")) {
@@ -0,0 +1,139 @@
+"""
+Teste local do cache da aplicação (cache.py) e da invalidação por entidade.
+
+Confere:
+  1. LRU + TTL do backend local (descarta o menos usado e o expirado);
+  2. invalidação por etiqueta, inclusive de valor calculado durante um commit;
+  3. backend compartilhado: duas instâncias (dois "workers") no mesmo servidor
+     Redis veem a invalidação uma da outra;
+  4. no app, um commit de Jogo/Financeiro invalida a lista de jogos e o dashboard,
+     e um rollback não invalida nada;
+  5. com as versões vindas de versao_dados, o cache local de outro worker também
+     vê a gravação (sem depender do TTL);
+  6. a etiqueta 'usuario' (usuário logado) fica no backend: ler não consulta
+     versao_dados e invalidar incrementa o contador do backend.
+
+Uso: python testar_cache.py
+O backend compartilhado usa CACHE_REDIS_URL (ex.: redis://localhost:6379/15) se
+definida; senão, o fakeredis (pip install fakeredis) como servidor local.
+"""
+
+import os
+import time
+import tempfile
+
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'cache.db')}"
+url_redis = os.environ.pop('CACHE_REDIS_URL', '')
+
+from cache import Cache, CacheLocal, CacheRedis
+
+def testar_backend(cache_a, cache_b, nome):
+    """cache_a e cache_b compartilham (ou não) o mesmo armazenamento"""
+    chamadas = []
+    def calcular():
+        chamadas.append(1)
+        return {'total': len(chamadas)}
+
+    assert cache_a.obter('k', calcular, ('jogo',)) == {'total': 1}
+    assert cache_a.obter('k', calcular, ('jogo',)) == {'total': 1}, 'segunda leitura deveria vir do cache'
+    assert cache_b.obter('k', calcular, ('jogo',)) == {'total': 1}, 'o outro worker deveria ler a mesma entrada'
+    cache_a.invalidar('financeiro')
+    assert cache_b.obter('k', calcular, ('jogo',)) == {'total': 1}, 'etiqueta de outra entidade nao invalida'
+    cache_a.invalidar('jogo')
+    assert cache_b.obter('k', calcular, ('jogo',)) == {'total': 2}, 'invalidacao deveria valer para o outro worker'
+
+    # Invalidação enquanto o valor é calculado: a entrada gravada já nasce vencida
+    def calcular_durante_commit():
+        cache_b.invalidar('jogo')
+        return 'antigo'
+    cache_a.obter('c', calcular_durante_commit, ('jogo',))
+    assert cache_a.obter('c', lambda: 'novo', ('jogo',)) == 'novo', 'valor calculado antes do commit nao pode ficar'
+    print(f"[OK] Invalidacao por etiqueta ({nome})")
+
+if __name__ == '__main__':
+    print("=" * 50)
+    local = CacheLocal(max_itens=2)
+    cache = Cache(local, ttl_padrao=60)
+    for chave in ('a', 'b'):
+        cache.obter(chave, lambda: chave)
+    cache.obter('a', lambda: 'x')          # 'a' passa a ser o mais recente
+    cache.obter('c', lambda: 'c')          # descarta 'b'
+    assert cache.obter('b', lambda: 'recalculado') == 'recalculado', 'LRU deveria descartar b'
+    assert cache.obter('a', lambda: 'x') == 'x'
+    cache.obter('ttl', lambda: 'velho', ttl=0.05)
+    time.sleep(0.1)
+    assert cache.obter('ttl', lambda: 'novo') == 'novo', 'entrada expirada deveria ser recalculada'
+    print("[OK] LRU + TTL do cache local")
+
+    testar_backend(cache, cache, 'local')
+
+    if url_redis:
+        import redis
+        clientes = [redis.Redis.from_url(url_redis) for _ in range(2)]
+        origem = url_redis
+    else:
+        try:
+            import fakeredis
+        except ImportError:
+            fakeredis = None
+        if fakeredis:
+            servidor = fakeredis.FakeServer()
+            clientes = [fakeredis.FakeRedis(server=servidor) for _ in range(2)]
+            origem = 'fakeredis'
+        else:
+            clientes = None
+            print("[AVISO] Sem CACHE_REDIS_URL nem fakeredis: backend compartilhado nao testado")
+    if clientes:
+        prefixo = f'teste-{os.getpid()}:'
+        worker_a, worker_b = (Cache(CacheRedis(cliente, prefixo)) for cliente in clientes)
+        testar_backend(worker_a, worker_b, f'redis via {origem}')
+        worker_a.limpar()
+
+    from app import app, db, cache as cache_app, Jogo, Financeiro, lista_jogos, resumo_dashboard, _versoes_para_cache
+    from datetime import date
+
+    with app.test_request_context():
+        antes = len(lista_jogos())
+        saldo = resumo_dashboard()['saldo']
+
+        db.session.add(Jogo(data=date.today(), adversario='Cache FC'))
+        db.session.flush()
+        db.session.rollback()
+        assert len(lista_jogos()) == antes, 'rollback nao deveria invalidar'
+
+        db.session.add(Jogo(data=date.today(), adversario='Cache FC'))
+        db.session.add(Financeiro(data=date.today(), tipo='ENTRADA', descricao='Teste cache', valor=10))
+        db.session.commit()
+        assert len(lista_jogos()) == antes + 1, 'commit de Jogo deveria invalidar a lista'
+        assert resumo_dashboard()['saldo'] == saldo + 10, 'commit de Financeiro deveria invalidar o dashboard'
+    print("[OK] Commit invalida a lista de jogos e o dashboard; rollback nao")
+
+    # Outro worker: cache local próprio, mesma fonte de versões (o banco)
+    outro_worker = Cache(CacheLocal(), fonte_versoes=_versoes_para_cache)
+    def contar_jogos():
+        return Jogo.query.count()
+    with app.test_request_context():
+        antes = outro_worker.obter('jogos:total', contar_jogos, ('jogo',))
+    with app.test_request_context():
+        db.session.add(Jogo(data=date.today(), adversario='Outro worker FC'))
+        db.session.commit()
+    with app.test_request_context():
+        assert outro_worker.obter('jogos:total', contar_jogos, ('jogo',)) == antes + 1, \
+            'gravacao em um worker deveria vencer o cache local dos outros'
+    print("[OK] Gravacao em um worker vence o cache local dos outros (versao_dados)")
+
+    # Usuário logado: versões no backend, sem ida ao banco na leitura
+    consultas = []
+    def fonte_contada(etiquetas):
+        consultas.append(etiquetas)
+        return (0,) * len(etiquetas)
+    local = Cache(CacheLocal(), fonte_versoes=fonte_contada, etiquetas_do_backend={'usuario'})
+    assert local.obter('usuario:1', lambda: 'admin', ('usuario',)) == 'admin'
+    assert local.obter('usuario:1', lambda: 'outro', ('usuario',)) == 'admin'
+    assert not consultas, 'entrada do usuario nao deveria consultar a fonte de versoes'
+    local.invalidar('usuario', 'jogo')
+    assert local.obter('usuario:1', lambda: 'jogador', ('usuario',)) == 'jogador', 'commit de User deveria invalidar'
+    print("[OK] Usuario logado validado pelo backend, sem consultar versao_dados")
+
+    print(f"\n[OK] Cache funcionando ({cache_app.estatisticas()})")
+    print("=" * 50)
@@ -0,0 +1,65 @@
+"""
+Teste local do roteamento para a réplica de leitura com dois arquivos SQLite.
+
+O primário é criado e populado, copiado para o arquivo da réplica (simulando a
+replicação) e então recebe um lançamento novo que a réplica não tem. Confere:
+  1. um GET de /financeiro sem gravação recente lê da réplica (não vê o lançamento);
+  2. logo após um POST (e o redirect), o mesmo usuário lê do primário;
+  3. os POSTs sempre gravam no primário.
+
+Uso: python testar_replica.py
+Com Postgres: defina DATABASE_URL e DATABASE_READ_URL para dois bancos locais e
+rode o app normalmente; o passo de cópia aqui é só para o SQLite.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+
+pasta = tempfile.mkdtemp()
+primario = os.path.join(pasta, 'primario.db')
+replica = os.path.join(pasta, 'replica.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{primario}'
+os.environ['DATABASE_READ_URL'] = f'sqlite:///{replica}'
+os.environ['REPLICA_ATRASO_MAX'] = '2'
+
+from app import app, db, Financeiro
+from datetime import date
+
+def contar(arquivo, descricao):
+    with sqlite3.connect(arquivo) as conexao:
+        return conexao.execute('SELECT COUNT(*) FROM financeiro WHERE descricao = ?', (descricao,)).fetchone()[0]
+
+if __name__ == '__main__':
+    with app.app_context():
+        db.session.add(Financeiro(data=date.today(), tipo='ENTRADA', descricao='Entrada replicada', valor=10))
+        db.session.commit()
+        db.engines[None].dispose()
+    shutil.copyfile(primario, replica)
+    print("[OK] Replica copiada do primario")
+
+    admin = app.test_client()
+    admin.post('/login/', data={'username': 'admin', 'password': '@admin1974'})
+    visitante = app.test_client()
+    visitante.post('/login/', data={'username': 'admin', 'password': '@admin1974'})
+
+    resposta = admin.post('/adicionar-entrada', data={'descricao': 'Entrada so no primario', 'valor': '25'})
+    print(f"[OK] POST /adicionar-entrada -> {resposta.status_code}")
+    assert contar(primario, 'Entrada so no primario') == 1, 'POST deveria gravar no primario'
+    assert contar(replica, 'Entrada so no primario') == 0, 'POST nao pode gravar na replica'
+    print("[OK] Gravacao foi para o primario")
+
+    pagina = admin.get('/financeiro').get_data(as_text=True)
+    assert 'Entrada so no primario' in pagina, 'apos o POST o usuario deveria ler do primario'
+    print("[OK] Quem acabou de gravar le do primario (read-your-writes)")
+
+    import time
+    time.sleep(2.5)
+    pagina = visitante.get('/financeiro').get_data(as_text=True)
+    assert 'Entrada replicada' in pagina and 'Entrada so no primario' not in pagina, 'GET deveria ler da replica'
+    pagina = admin.get('/financeiro').get_data(as_text=True)
+    assert 'Entrada so no primario' not in pagina, 'passado REPLICA_ATRASO_MAX o GET volta para a replica'
+    print("[OK] GET somente-leitura le da replica")
+
+    print("\n[OK] Roteamento primario/replica funcionando")